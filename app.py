@@ -1,63 +1,197 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
-import requests
-from bs4 import BeautifulSoup
 import json
+import base64
 import os
+import re
 from dotenv import load_dotenv
-import sqlite3
 from datetime import datetime
-import re
 import time  # Add this import for delays
+import threading
+import atexit
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FuturesTimeoutError
+from host_scheduler import HostScheduler
+from fetch_client import get_client
+from db import get_database, close_all
+from recipe_extraction import (extract_recipe, make_soup, is_complete, RecipeMarkupScanner,
+                               validate_and_optimize_image_url, get_fallback_image_url)
+from image_validation import ImageValidator
+from scrape_jobs import JobManager, stream_job_events, stream_job_ndjson
+from site_adapters import SITE_ADAPTERS, CARD_HEADING_TAGS, CARD_TITLE_CLASS_RE, get_adapter
+from query_cache import QueryCache
+from schema import RECIPE_UPSERT_SQL, create_schema
+from ingredient_parser import normalize_name, save_recipe_ingredients
+from pantry_matching import PantryIndex, pantry_names, missing_ingredients
+from selector_stats import SelectorStats
+from prewarm import PrewarmCrawler
+import metrics
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 
+# Overall time budget (seconds) for one /api/scrape-recipes request, and the most a client may ask for
+SCRAPE_DEADLINE_SECONDS = float(os.getenv('SCRAPE_DEADLINE_SECONDS', '25'))
+SCRAPE_MAX_DEADLINE_SECONDS = float(os.getenv('SCRAPE_MAX_DEADLINE_SECONDS', '60'))
+
+# Sources stop fetching at the deadline; this is how long they get to hand back what they have
+SOURCE_WIND_DOWN_SECONDS = 1.0
+
+# Shared pool used to run the recipe sources concurrently
+source_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SCRAPE_SOURCE_WORKERS', '6')),
+    thread_name_prefix='scrape-source'
+)
+
+# Read schema.org JSON-LD before falling back to the CSS selector cascade
+JSON_LD_FIRST = os.getenv('RECIPE_JSON_LD_FIRST', '1') == '1'
+
+# How many detail pages were extracted by each path, for hit-rate reporting
+extraction_stats = {'json_ld': 0, 'selectors': 0}
+extraction_stats_lock = threading.Lock()
+
+# Pooled keep-alive HTTP client shared by all scraping and image checks
+fetch_client = get_client()
+
+# Pooled persistent SQLite connections (WAL mode) shared by all routes and workers
+database = get_database('recipes.db')
+
+# Page size for GET /api/recipes when no limit is given, and the largest allowed
+RECIPES_PAGE_SIZE = int(os.getenv('RECIPES_PAGE_SIZE', '50'))
+RECIPES_MAX_PAGE_SIZE = int(os.getenv('RECIPES_MAX_PAGE_SIZE', '200'))
+
+# Stop downloading a recipe page once its JSON-LD or <main> container has arrived
+# (bodies are also capped at HTTP_MAX_BODY_MB by the client)
+STREAM_EARLY_STOP = os.getenv('HTTP_STREAM_EARLY_STOP', '1') == '1'
+
+# Image reachability checks run concurrently and are cached per URL
+IMAGE_CHECK_TIMEOUT = float(os.getenv('IMAGE_CHECK_TIMEOUT', '5'))
+IMAGE_CHECK_BATCH_TIMEOUT = float(os.getenv('IMAGE_CHECK_BATCH_TIMEOUT', '8'))
+image_validator = ImageValidator(
+    lambda url: test_image_url(url),
+    max_workers=int(os.getenv('IMAGE_CHECK_WORKERS', '8')),
+    positive_ttl=int(os.getenv('IMAGE_CACHE_TTL', '86400')),
+    negative_ttl=int(os.getenv('IMAGE_CACHE_NEGATIVE_TTL', '600'))
+)
+
+# Detail pages are fetched in parallel but rate limited per host
+detail_scheduler = HostScheduler(
+    max_workers=int(os.getenv('SCRAPE_DETAIL_WORKERS', '8')),
+    requests_per_second=float(os.getenv('SCRAPE_REQUESTS_PER_SECOND', '2')),
+    max_per_host=int(os.getenv('SCRAPE_MAX_PER_HOST', '2'))
+)
+
+# Repeat searches are answered from stored results; stale ones refresh in the background
+query_cache = QueryCache(
+    'recipes.db',
+    ttl=int(os.getenv('QUERY_CACHE_TTL', '3600')),
+    stale_ttl=int(os.getenv('QUERY_CACHE_STALE_TTL', '86400')),
+    refresh_workers=int(os.getenv('QUERY_CACHE_REFRESH_WORKERS', '2'))
+)
+
+# Learn which selectors work on each site so later pages skip the full cascade
+selector_stats = SelectorStats(
+    'recipes.db',
+    min_hits=int(os.getenv('SELECTOR_MIN_HITS', '3'))
+) if os.getenv('SELECTOR_LEARNING', '1') == '1' else None
+
+# Inverted ingredient -> recipes index for ranking recipes by pantry coverage
+pantry_index = PantryIndex(
+    'recipes.db',
+    rebuild_interval=int(os.getenv('PANTRY_INDEX_REBUILD_SECONDS', '3600'))
+)
+
+# Per-stage latency and request metrics, exposed in Prometheus format at /api/metrics
+stage_seconds = metrics.histogram(
+    'spicerack_stage_duration_seconds', 'Time spent in each scrape pipeline stage', ['stage'])
+stage_errors = metrics.counter(
+    'spicerack_stage_errors_total', 'Scrape pipeline stages that raised an exception', ['stage'])
+fetch_responses = metrics.counter(
+    'spicerack_fetch_responses_total', 'Outbound page fetches by stage and HTTP status', ['stage', 'status'])
+source_seconds = metrics.histogram(
+    'spicerack_source_duration_seconds', 'Time to scrape one recipe site end to end', ['source', 'status'])
+fetch_bytes = metrics.counter(
+    'spicerack_fetch_bytes_total', 'Decoded page bytes downloaded, by stage', ['stage'])
+fetch_truncations = metrics.counter(
+    'spicerack_fetch_truncations_total', 'Page downloads stopped before the end of the body', ['stage', 'reason'])
+extractions = metrics.counter(
+    'spicerack_extractions_total', 'Recipe pages extracted, by extraction path', ['method'])
+query_cache_results = metrics.counter(
+    'spicerack_query_cache_results_total', 'Scrape requests by query cache outcome', ['result'])
+http_requests = metrics.counter(
+    'spicerack_http_requests_total', 'API requests handled', ['method', 'route', 'status'])
+http_request_seconds = metrics.histogram(
+    'spicerack_http_request_duration_seconds', 'API request latency', ['method', 'route'])
+
+@contextmanager
+def track_stage(stage):
+    """Time a pipeline stage and count it as an error if it raises"""
+    with stage_seconds.time(stage=stage):
+        try:
+            yield
+        except Exception:
+            stage_errors.inc(stage=stage)
+            raise
+
+def requested_deadline(data):
+    """The request's "deadline" in seconds, clamped to SCRAPE_MAX_DEADLINE_SECONDS"""
+    deadline = float(data.get('deadline', SCRAPE_DEADLINE_SECONDS))
+    return min(max(deadline, 0.0), SCRAPE_MAX_DEADLINE_SECONDS)
+
+def time_left(stop_at):
+    """Seconds until the monotonic time stop_at, or None when there is no deadline"""
+    if stop_at is None:
+        return None
+    return max(stop_at - time.monotonic(), 0.0)
+
 # Database initialization
 def init_db():
-    conn = sqlite3.connect('recipes.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recipes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            ingredients TEXT NOT NULL,
-            instructions TEXT NOT NULL,
-            nutrition_info TEXT,
-            image_url TEXT,
-            source_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_ingredients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ingredient_name TEXT NOT NULL,
-            quantity TEXT,
-            unit TEXT,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        create_schema(cursor)
+        backfill_recipe_ingredients(cursor)
+        
+        conn.commit()
+
+def backfill_recipe_ingredients(cursor):
+    """Parse the ingredients of recipes stored without recipe_ingredients rows"""
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS saved_recipes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recipe_id INTEGER,
-            user_rating INTEGER,
-            notes TEXT,
-            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-        )
+        SELECT id, ingredients FROM recipes
+        WHERE json_array_length(ingredients) > 0
+          AND NOT EXISTS (SELECT 1 FROM recipe_ingredients WHERE recipe_id = recipes.id)
     ''')
-    
-    conn.commit()
-    conn.close()
+    pending = [(recipe_id, json.loads(ingredients)) for recipe_id, ingredients in cursor.fetchall()]
+    if pending:
+        save_recipe_ingredients(cursor, pending)
+        print(f"Parsed ingredients of {len(pending)} stored recipes")
 
 # Initialize database on startup
 init_db()
+atexit.register(close_all)
+if selector_stats:
+    selector_stats.load()
+    atexit.register(selector_stats.flush)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses are timed until their headers are sent
+    started = g.pop('request_started', None)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if started is not None:
+        http_request_seconds.observe(time.perf_counter() - started, method=request.method, route=route)
+    http_requests.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Counters and latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -70,95 +204,87 @@ def scrape_recipes():
         query = data.get('query', 'chicken recipes')
         max_recipes = data.get('max_recipes', 10)
         
-        print(f"Scraping recipes for query: {query}")
+        parallel = data.get('parallel', True)
+        deadline = requested_deadline(data)
+        if PREWARM_ENABLED:
+            prewarm_crawler.log_search(query, max_recipes)
         
-        # Scrape recipes from multiple sources
-        recipes = []
-        
-        # AllRecipes scraping
-        print("Scraping AllRecipes...")
-        allrecipes_recipes = scrape_allrecipes(query, max_recipes // 2)
-        print(f"Found {len(allrecipes_recipes)} recipes from AllRecipes")
-        recipes.extend(allrecipes_recipes)
-        
-        # Food Network scraping
-        print("Scraping Food Network...")
-        foodnetwork_recipes = scrape_foodnetwork(query, max_recipes // 3)
-        print(f"Found {len(foodnetwork_recipes)} recipes from Food Network")
-        recipes.extend(foodnetwork_recipes)
-        
-        # Epicurious scraping
-        print("Scraping Epicurious...")
-        epicurious_recipes = scrape_epicurious(query, max_recipes // 3)
-        print(f"Found {len(epicurious_recipes)} recipes from Epicurious")
-        recipes.extend(epicurious_recipes)
-        
-        # If no recipes found from scraping, provide fallback data
-        if len(recipes) == 0:
-            print("No recipes found from scraping, providing fallback data...")
-            recipes = get_fallback_recipes(query, max_recipes)
-        
-        # Save recipes to database
-        saved_recipes = []
-        for recipe in recipes:
-            recipe_id = save_recipe_to_db(recipe)
-            recipe['id'] = recipe_id
-            saved_recipes.append(recipe)
-        
-        print(f"Total recipes saved: {len(saved_recipes)}")
+        # Job mode: hand the crawl to the background pool and return immediately
+        if data.get('async'):
+            job = scrape_job_manager.submit(query, max_recipes, deadline=deadline, parallel=parallel)
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f"/api/scrape-jobs/{job.id}",
+                'events_url': f"/api/scrape-jobs/{job.id}/events"
+            }), 202
+        
+        # "refresh": true skips the query cache and always crawls
+        result = query_cache.get_or_fetch(
+            query, max_recipes,
+            lambda: run_scrape(query, max_recipes, deadline, parallel),
+            refresh=bool(data.get('refresh'))
+        )
+        query_cache_results.inc(result=result['cache'])
+        saved_recipes = result['recipes']
+        if saved_recipes is None:
+            saved_recipes = get_recipes_by_ids(result['recipe_ids'])
+            # Every cached recipe has since been deleted; crawl again
+            if not saved_recipes:
+                result = query_cache.get_or_fetch(
+                    query, max_recipes,
+                    lambda: run_scrape(query, max_recipes, deadline, parallel),
+                    refresh=True
+                )
+                saved_recipes = result['recipes']
         
         return jsonify({
             'success': True,
             'recipes': saved_recipes,
-            'total_found': len(saved_recipes)
+            'total_found': len(saved_recipes),
+            'sources': result['sources'],
+            'cache': result['cache']
         })
         
     except Exception as e:
         print(f"Error in scrape_recipes: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def scrape_allrecipes(query, max_recipes):
+def scrape_site(adapter, query, max_recipes, on_recipe=None, stop_at=None):
+    """Search one recipe site described by a SiteAdapter and fetch its recipes
+
+    stop_at is a time.monotonic() deadline: no requests are started after
+    it, and whatever recipes have been fetched by then are returned.
+    """
     recipes = []
     try:
-        # Search AllRecipes
-        search_url = f"https://www.allrecipes.com/search?q={query.replace(' ', '+')}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
-        
-        print(f"Searching AllRecipes: {search_url}")
-        response = requests.get(search_url, headers=headers, timeout=15)
-        print(f"AllRecipes response status: {response.status_code}")
+        if stop_at is not None and time.monotonic() >= stop_at:
+            print(f"Deadline passed before searching {adapter.name}")
+            return recipes
+        search_url = adapter.search_url_for(query)
+        
+        print(f"Searching {adapter.name}: {search_url}")
+        # Don't let one slow search outlive the deadline by a full client timeout
+        timeout = time_left(stop_at)
+        if timeout is not None:
+            timeout = max(min(timeout, fetch_client.timeout), 1.0)
+        with track_stage('search_fetch'):
+            response = fetch_client.get_streaming(search_url, timeout=timeout)
+        record_fetch('search_fetch', response)
+        print(f"{adapter.name} response status: {response.status_code}")
         
         if response.status_code != 200:
-            print(f"AllRecipes returned status {response.status_code}")
+            print(f"{adapter.name} returned status {response.status_code}")
             return recipes
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        with track_stage('html_parse'):
+            soup = make_soup(response.content)
         
-        # Try multiple selectors for recipe cards - updated for current AllRecipes structure
+        # Try the site's card selectors, then the generic ones (all precompiled)
         recipe_cards = []
-        selectors = [
-            'a[href*="/recipe/"]',  # Direct recipe links
-            'div[class*="card__detailsContainer"]',
-            'div[class*="recipe-card"]',
-            'div[class*="search-result"]',
-            'article[class*="recipe"]',
-            'div[class*="recipe-item"]',
-            'div[class*="card"]'
-        ]
-        
-        for selector in selectors:
-            recipe_cards = soup.select(selector)
+        for selector, compiled in adapter.card_selectors:
+            recipe_cards = compiled.select(soup)
             if recipe_cards:
                 print(f"Found {len(recipe_cards)} recipe cards using selector: {selector}")
                 break
@@ -166,29 +292,28 @@ def scrape_allrecipes(query, max_recipes):
         if not recipe_cards:
             print("No recipe cards found with any selector")
             # Try to find any links that might be recipes
-            recipe_links = soup.find_all('a', href=re.compile(r'/recipe/'))
+            recipe_links = soup.find_all('a', href=adapter.recipe_link_re)
             print(f"Found {len(recipe_links)} potential recipe links")
             if recipe_links:
                 recipe_cards = recipe_links[:max_recipes]
         
         recipe_cards = recipe_cards[:max_recipes]
+        candidates = []
+        seen_urls = set()
         
         for i, card in enumerate(recipe_cards):
             try:
-                print(f"Processing recipe card {i+1}/{len(recipe_cards)}")
-                
-                # Try different ways to extract title and link
-                title = None
-                recipe_url = None
+                print(f"Processing {adapter.name} recipe card {i+1}/{len(recipe_cards)}")
                 
                 # Method 1: Look for title in h3 or similar elements
-                title_elem = card.find(['h3', 'h2', 'h1'])
+                title = None
+                title_elem = card.find(CARD_HEADING_TAGS)
                 if title_elem:
                     title = title_elem.get_text(strip=True)
                 
                 # Method 2: Look for title in class names
                 if not title:
-                    title_elem = card.find(class_=re.compile(r'title|headline|name'))
+                    title_elem = card.find(class_=CARD_TITLE_CLASS_RE)
                     if title_elem:
                         title = title_elem.get_text(strip=True)
                 
@@ -196,723 +321,826 @@ def scrape_allrecipes(query, max_recipes):
                 if not title:
                     title = card.get_text(strip=True)[:100]  # First 100 chars
                 
-                # Find recipe URL - improved logic
+                # Find recipe URL
                 if card.name == 'a':
                     recipe_url = card.get('href')
                 else:
                     link_elem = card.find('a')
-                    if link_elem:
-                        recipe_url = link_elem.get('href')
+                    recipe_url = link_elem.get('href') if link_elem else None
                 
-                # Make URL absolute and clean it
-                if recipe_url:
-                    if not recipe_url.startswith('http'):
-                        if recipe_url.startswith('/'):
-                            recipe_url = 'https://www.allrecipes.com' + recipe_url
-                        else:
-                            recipe_url = 'https://www.allrecipes.com/' + recipe_url
-                    
-                    # Only process if it's actually a recipe URL
-                    if '/recipe/' not in recipe_url:
-                        continue
-                
-                print(f"Title: {title}")
-                print(f"URL: {recipe_url}")
+                if not recipe_url:
+                    continue
+                recipe_url = adapter.absolute_url(recipe_url)
                 
-                if recipe_url and title and '/recipe/' in recipe_url:
-                    # Get detailed recipe info
-                    recipe_details = get_recipe_details(recipe_url, headers)
-                    if recipe_details:
-                        recipes.append(recipe_details)
-                        print(f"Successfully added recipe: {recipe_details['title']}")
-                    else:
-                        print(f"Failed to get details for: {title}")
-                    
-                    # Add a small delay to be respectful to the website
-                    time.sleep(1)
+                # Only process if it's actually a recipe URL
+                if title and adapter.is_recipe_url(recipe_url) and recipe_url not in seen_urls:
+                    print(f"Title: {title}")
+                    print(f"URL: {recipe_url}")
+                    seen_urls.add(recipe_url)
+                    candidates.append((title, recipe_url))
                         
             except Exception as e:
-                print(f"Error processing recipe card {i+1}: {e}")
+                print(f"Error processing {adapter.name} recipe card {i+1}: {e}")
                 continue
+        
+        # Fetch detail pages concurrently, rate limited per host
+        recipes.extend(fetch_recipe_details(candidates, on_recipe, stop_at))
                 
     except Exception as e:
-        print(f"Error scraping AllRecipes: {e}")
+        print(f"Error scraping {adapter.name}: {e}")
     
-    print(f"AllRecipes scraping completed. Found {len(recipes)} recipes.")
+    print(f"{adapter.name} scraping completed. Found {len(recipes)} recipes.")
     return recipes
 
+def scrape_allrecipes(query, max_recipes):
+    return scrape_site(get_adapter('allrecipes'), query, max_recipes)
+
 def scrape_foodnetwork(query, max_recipes):
-    recipes = []
+    return scrape_site(get_adapter('foodnetwork'), query, max_recipes)
+
+def scrape_epicurious(query, max_recipes):
+    return scrape_site(get_adapter('epicurious'), query, max_recipes)
+
+def fetch_recipe_details(candidates, on_recipe=None, stop_at=None):
+    """Fetch detail pages for (title, url) candidates through the host scheduler.
+
+    URLs already stored in the recipes table are served from the database
+    without any network fetch. Results keep the order of the candidates;
+    failed pages are dropped. Each page's image check starts as soon as the
+    page has been parsed; without on_recipe the images are resolved as one
+    batch at the end. If on_recipe is given it is called with each recipe,
+    image resolved, as soon as that recipe's own check completes, from the
+    checking thread; recipes whose check is still running when the page
+    fetches are over get at most IMAGE_CHECK_BATCH_TIMEOUT more before they
+    are delivered with a fallback image. Pages not fetched by the monotonic
+    time stop_at are cancelled and dropped.
+    """
+    known = get_recipes_by_source_urls([url for _, url in candidates])
+    results = [None] * len(candidates)
+    pending = {}
+    image_checks = []
+    delivered = set()
+    delivered_lock = threading.Lock()
+    
+    def deliver(index, image_ok):
+        with delivered_lock:
+            if index in delivered:
+                return
+            delivered.add(index)
+        apply_image_check(results[index], image_ok)
+        on_recipe(results[index])
+    
+    for index, (title, url) in enumerate(candidates):
+        if url in known:
+            print(f"Using stored recipe: {known[url]['title']}")
+            results[index] = known[url]
+            if on_recipe:
+                on_recipe(known[url])
+        else:
+            future = detail_scheduler.submit(url, get_recipe_details, url, validate_image=False)
+            pending[future] = (index, title)
+    
+    fetched = []
     try:
-        # Search Food Network
-        search_url = f"https://www.foodnetwork.com/search/{query.replace(' ', '-')}-"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
-        
-        print(f"Searching Food Network: {search_url}")
-        response = requests.get(search_url, headers=headers, timeout=15)
-        print(f"Food Network response status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"Food Network returned status {response.status_code}")
-            return recipes
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Try multiple selectors for recipe cards - updated for current Food Network structure
-        recipe_cards = []
-        selectors = [
-            'a[href*="/recipes/"]',  # Direct recipe links
-            'div[class*="o-ResultCard"]',
-            'div[class*="recipe-card"]',
-            'div[class*="search-result"]',
-            'article[class*="recipe"]',
-            'div[class*="recipe-item"]',
-            'div[class*="card"]'
-        ]
-        
-        for selector in selectors:
-            recipe_cards = soup.select(selector)
-            if recipe_cards:
-                print(f"Found {len(recipe_cards)} recipe cards using selector: {selector}")
-                break
-        
-        if not recipe_cards:
-            print("No recipe cards found with any selector")
-            # Try to find any links that might be recipes
-            recipe_links = soup.find_all('a', href=re.compile(r'/recipes/'))
-            print(f"Found {len(recipe_links)} potential recipe links")
-            if recipe_links:
-                recipe_cards = recipe_links[:max_recipes]
-        
-        recipe_cards = recipe_cards[:max_recipes]
-        
-        for i, card in enumerate(recipe_cards):
+        for future in as_completed(pending, timeout=time_left(stop_at)):
+            index, title = pending.pop(future)
             try:
-                print(f"Processing Food Network recipe card {i+1}/{len(recipe_cards)}")
-                
-                # Try different ways to extract title and link
-                title = None
-                recipe_url = None
-                
-                # Method 1: Look for title in h3 or similar elements
-                title_elem = card.find(['h3', 'h2', 'h1'])
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                
-                # Method 2: Look for title in class names
-                if not title:
-                    title_elem = card.find(class_=re.compile(r'title|headline|name'))
-                    if title_elem:
-                        title = title_elem.get_text(strip=True)
-                
-                # Method 3: Look for title in any text content
-                if not title:
-                    title = card.get_text(strip=True)[:100]  # First 100 chars
-                
-                # Find recipe URL - improved logic
-                if card.name == 'a':
-                    recipe_url = card.get('href')
-                else:
-                    link_elem = card.find('a')
-                    if link_elem:
-                        recipe_url = link_elem.get('href')
-                
-                # Make URL absolute and clean it
-                if recipe_url:
-                    if not recipe_url.startswith('http'):
-                        if recipe_url.startswith('/'):
-                            recipe_url = 'https://www.foodnetwork.com' + recipe_url
-                        else:
-                            recipe_url = 'https://www.foodnetwork.com/' + recipe_url
-                    
-                    # Only process if it's actually a recipe URL
-                    if '/recipes/' not in recipe_url:
-                        continue
-                
-                print(f"Title: {title}")
-                print(f"URL: {recipe_url}")
-                
-                if recipe_url and title and '/recipes/' in recipe_url:
-                    # Get detailed recipe info
-                    recipe_details = get_recipe_details(recipe_url, headers)
-                    if recipe_details:
-                        recipes.append(recipe_details)
-                        print(f"Successfully added recipe: {recipe_details['title']}")
-                    else:
-                        print(f"Failed to get details for: {title}")
-                    
-                    # Add a small delay to be respectful to the website
-                    time.sleep(1)
-                        
+                recipe_details = future.result()
             except Exception as e:
-                print(f"Error processing Food Network recipe card {i+1}: {e}")
+                print(f"Error fetching details for {title}: {e}")
+                recipe_details = None
+            if not recipe_details:
+                print(f"Failed to get details for: {title}")
                 continue
-                
-    except Exception as e:
-        print(f"Error scraping Food Network: {e}")
+            
+            results[index] = recipe_details
+            print(f"Successfully added recipe: {recipe_details['title']}")
+            if not on_recipe:
+                # Checked now so it overlaps the remaining page fetches, resolved with the batch below
+                if recipe_details.get('image_url'):
+                    image_validator.submit(recipe_details['image_url'])
+                fetched.append(recipe_details)
+            elif recipe_details.get('image_url'):
+                check = image_validator.submit(recipe_details['image_url'])
+                image_checks.append((index, check))
+                check.add_done_callback(lambda check, index=index: deliver(index, check.result()))
+            else:
+                deliver(index, False)
+    except FuturesTimeoutError:
+        # Queued pages never start; pages already downloading finish on their own and are dropped
+        for future in pending:
+            future.cancel()
+        print(f"Deadline reached with {len(pending)} recipe pages outstanding")
     
-    print(f"Food Network scraping completed. Found {len(recipes)} recipes.")
-    return recipes
+    if on_recipe:
+        # Don't return before every streamed recipe has gone out, with a fallback image if need be
+        undelivered = [(index, check) for index, check in image_checks if not check.done()]
+        if undelivered:
+            timeout = time_left(stop_at)
+            if timeout is None or timeout > IMAGE_CHECK_BATCH_TIMEOUT:
+                timeout = IMAGE_CHECK_BATCH_TIMEOUT
+            with track_stage('image_validation'):
+                wait([check for _, check in undelivered], timeout=timeout)
+            for index, check in undelivered:
+                deliver(index, check.done() and check.result())
+    else:
+        resolve_recipe_images(fetched, time_left(stop_at))
+    return [recipe for recipe in results if recipe]
 
-def scrape_epicurious(query, max_recipes):
+def resolve_recipe_images(recipes, timeout=None):
+    """Validate image URLs for a batch of recipes concurrently.
+
+    Unreachable or missing images are replaced with a fallback image
+    based on the recipe content. Results are cached per URL, so shared
+    CDN images are only checked once per TTL. The wait is capped at
+    IMAGE_CHECK_BATCH_TIMEOUT, or timeout if that is shorter.
+    """
+    urls = [recipe['image_url'] for recipe in recipes if recipe.get('image_url')]
+    results = {}
+    if urls:
+        if timeout is None or timeout > IMAGE_CHECK_BATCH_TIMEOUT:
+            timeout = IMAGE_CHECK_BATCH_TIMEOUT
+        with track_stage('image_validation'):
+            results = image_validator.validate_many(urls, timeout=timeout)
+    
+    for recipe in recipes:
+        apply_image_check(recipe, results.get(recipe.get('image_url')))
+
+def apply_image_check(recipe, image_ok):
+    """Swap in a fallback image unless the recipe's image URL checked out"""
+    image_url = recipe.get('image_url')
+    if image_url and image_ok:
+        return
+    if image_url:
+        print(f"Image URL not accessible, using fallback: {image_url}")
+    recipe['image_url'] = get_fallback_image_url(recipe['title'], recipe['ingredients'])
+    print(f"Using fallback image: {recipe['image_url']}")
+
+def run_recipe_source(adapter, query, max_recipes, on_recipe=None, stop_at=None):
+    """Scrape a single site and return (recipes, status)
+
+    A site cut short by the monotonic deadline stop_at keeps the recipes it
+    had fetched and is reported as 'timeout'.
+    """
+    started = time.monotonic()
+    try:
+        print(f"Scraping {adapter.name}...")
+        found = scrape_site(adapter, query, max_recipes, on_recipe, stop_at)
+        print(f"Found {len(found)} recipes from {adapter.name}")
+        timed_out = stop_at is not None and time.monotonic() >= stop_at
+        status = {'status': 'timeout' if timed_out else 'ok', 'count': len(found)}
+    except Exception as e:
+        print(f"Error scraping {adapter.name}: {e}")
+        found = []
+        status = {'status': 'error', 'count': 0, 'error': str(e)}
+    status['elapsed'] = round(time.monotonic() - started, 3)
+    source_seconds.observe(status['elapsed'], source=adapter.key, status=status['status'])
+    return found, status
+
+def scrape_all_sources(query, max_recipes, deadline=SCRAPE_DEADLINE_SECONDS, parallel=True,
+                       on_source_done=None, on_recipe=None):
+    """Scrape every registered recipe site under one overall deadline.
+
+    In parallel mode all sources run at the same time. At the deadline every
+    source stops starting requests and hands back the recipes it has, reported
+    as 'timeout'; one still stuck in a request SOURCE_WIND_DOWN_SECONDS later
+    is reported as 'timeout' and its results dropped, apart from the recipes
+    it had already passed to on_recipe, which are kept and counted.
+    on_source_done(key, recipes, status) is called from the calling thread as
+    each source finishes; on_recipe(recipe) is called from the scraping
+    threads as each recipe is parsed, and never after this returns.
+    Returns (recipes, per-source status dict).
+    """
+    started = time.monotonic()
+    stop_at = started + deadline
     recipes = []
+    sources = {}
+    adapters = list(SITE_ADAPTERS)
+    
+    if not parallel:
+        for adapter in adapters:
+            if time.monotonic() >= stop_at:
+                sources[adapter.key] = {'status': 'skipped', 'count': 0, 'elapsed': 0}
+                continue
+            found, status = run_recipe_source(adapter, query, max_recipes // adapter.share, on_recipe, stop_at)
+            recipes.extend(found)
+            sources[adapter.key] = status
+            if on_source_done:
+                on_source_done(adapter.key, found, status)
+        return recipes, sources
+    
+    delivered = {adapter.key: 0 for adapter in adapters}
+    delivered_lock = threading.Lock()
+    closed = threading.Event()
+    
+    def recipe_sink(key):
+        if on_recipe is None:
+            return None
+        def deliver(recipe):
+            with delivered_lock:
+                # Stragglers still running once results are collected no longer contribute
+                if closed.is_set():
+                    return
+                delivered[key] += 1
+                on_recipe(recipe)
+        return deliver
+    
+    futures = {
+        source_executor.submit(run_recipe_source, adapter, query, max_recipes // adapter.share,
+                               recipe_sink(adapter.key), stop_at): adapter.key
+        for adapter in adapters
+    }
+    results = {}
     try:
-        # Search Epicurious
-        search_url = f"https://www.epicurious.com/search/{query.replace(' ', '-')}-"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
-        
-        print(f"Searching Epicurious: {search_url}")
-        response = requests.get(search_url, headers=headers, timeout=15)
-        print(f"Epicurious response status: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"Epicurious returned status {response.status_code}")
-            return recipes
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Try multiple selectors for recipe cards - updated for current Epicurious structure
-        recipe_cards = []
-        selectors = [
-            'a[href*="/recipes/"]',  # Direct recipe links
-            'div[class*="o-ResultCard"]',
-            'div[class*="recipe-card"]',
-            'div[class*="search-result"]',
-            'article[class*="recipe"]',
-            'div[class*="recipe-item"]',
-            'div[class*="card"]'
-        ]
-        
-        for selector in selectors:
-            recipe_cards = soup.select(selector)
-            if recipe_cards:
-                print(f"Found {len(recipe_cards)} recipe cards using selector: {selector}")
-                break
-        
-        if not recipe_cards:
-            print("No recipe cards found with any selector")
-            # Try to find any links that might be recipes
-            recipe_links = soup.find_all('a', href=re.compile(r'/recipes/'))
-            print(f"Found {len(recipe_links)} potential recipe links")
-            if recipe_links:
-                recipe_cards = recipe_links[:max_recipes]
-        
-        recipe_cards = recipe_cards[:max_recipes]
+        for future in as_completed(futures, timeout=deadline + SOURCE_WIND_DOWN_SECONDS):
+            key = futures[future]
+            results[key] = future.result()
+            if on_source_done:
+                on_source_done(key, *results[key])
+    except FuturesTimeoutError:
+        pass
+    with delivered_lock:
+        closed.set()
+    
+    # Collect in registry order so results stay deterministic
+    for future, key in futures.items():
+        if key in results:
+            found, status = results[key]
+            recipes.extend(found)
+            sources[key] = status
+        else:
+            future.cancel()
+            print(f"Source {key} did not finish within {deadline}s deadline")
+            sources[key] = {'status': 'timeout', 'count': delivered[key],
+                            'elapsed': round(time.monotonic() - started, 3)}
+    
+    return recipes, sources
+
+def run_scrape(query, max_recipes, deadline=SCRAPE_DEADLINE_SECONDS, parallel=True, on_event=None):
+    """Scrape all sources, persist the recipes and return (saved_recipes, sources).
+
+    With an on_event(event_type, data) listener each recipe is stored as
+    soon as its page and image check are done, and the listener receives a
+    'recipe' event for every recipe once it has been stored and a 'source'
+    event when each site finishes. Without one, images are resolved as one
+    batch per site and the whole result is written in a single transaction
+    once the crawl is over.
+    """
+    saved_recipes = []
+    lock = threading.Lock()
+    
+    def persist(recipe):
+        # Called from the scraping and image-check threads
+        with lock:
+            # Recipes served from the table already have an id
+            if not recipe.get('id'):
+                recipe['id'] = save_recipe_to_db(recipe)
+            saved_recipes.append(recipe)
+            on_event('recipe', recipe)
+    
+    def on_source_done(key, found, status):
+        on_event('source', dict(status, source=key))
+    
+    print(f"Scraping recipes for query: {query}")
+    
+    # Scrape recipes from multiple sources
+    if on_event:
+        _, sources = scrape_all_sources(query, max_recipes, deadline, parallel, on_source_done, persist)
+    else:
+        saved_recipes, sources = scrape_all_sources(query, max_recipes, deadline, parallel)
+    
+    # If no recipes found from scraping, provide fallback data
+    if len(saved_recipes) == 0:
+        print("No recipes found from scraping, providing fallback data...")
+        for recipe in get_fallback_recipes(query, max_recipes):
+            if on_event:
+                persist(recipe)
+            else:
+                saved_recipes.append(recipe)
+    
+    if not on_event:
+        # Written together, and given their ids, once the crawl is over
+        pending = [recipe for recipe in saved_recipes if not recipe.get('id')]
+        for recipe, recipe_id in zip(pending, save_recipes_to_db(pending)):
+            recipe['id'] = recipe_id
+    
+    print(f"Total recipes saved: {len(saved_recipes)}")
+    return saved_recipes, sources
+
+# Background pool for /api/scrape-recipes requests made with "async": true
+scrape_job_manager = JobManager(
+    run_scrape,
+    'recipes.db',
+    max_workers=int(os.getenv('SCRAPE_JOB_WORKERS', '4')),
+    retention_seconds=int(os.getenv('SCRAPE_JOB_RETENTION_SECONDS', '3600')),
+    stale_seconds=int(os.getenv('SCRAPE_JOB_STALE_SECONDS', '60'))
+)
+
+def prewarm_query(query, max_recipes):
+    """Re-crawl a popular search into the query cache, off the request path"""
+    result = query_cache.get_or_fetch(query, max_recipes, lambda: run_scrape(query, max_recipes), refresh=True)
+    return len(result['recipe_ids'])
+
+# Searches are only logged to the frontier while pre-warming is on
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', '0') == '1'
+
+# Periodically refreshes popular searches before their cached results expire
+prewarm_crawler = PrewarmCrawler(
+    'recipes.db',
+    prewarm_query,
+    interval=int(os.getenv('PREWARM_INTERVAL_SECONDS', '600')),
+    max_queries=int(os.getenv('PREWARM_MAX_QUERIES', '5')),
+    budget_seconds=int(os.getenv('PREWARM_BUDGET_SECONDS', '120')),
+    recrawl_after=int(os.getenv('PREWARM_RECRAWL_SECONDS', '3000')),
+    half_life_hours=float(os.getenv('PREWARM_HALF_LIFE_HOURS', '24')),
+    min_score=float(os.getenv('PREWARM_MIN_SCORE', '2'))
+)
+
+# The debug reloader's watcher process imports this module too; only the serving process crawls
+if PREWARM_ENABLED and (__name__ != '__main__' or os.getenv('WERKZEUG_RUN_MAIN') == 'true'):
+    prewarm_crawler.start()
+
+@app.route('/api/prewarm', methods=['GET'])
+def get_prewarm_status():
+    """The pre-warm crawler's state and the top of its frontier"""
+    limit = request.args.get('limit', 20, type=int)
+    try:
+        return jsonify({
+            'success': True,
+            'crawler': prewarm_crawler.stats(),
+            'frontier': prewarm_crawler.frontier(limit)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scrape-recipes/stream', methods=['POST'])
+def stream_scrape_recipes():
+    """Scrape like /api/scrape-recipes but stream each recipe as soon as it is stored.
+
+    The default response is newline-delimited JSON: one {"type": "recipe"}
+    record per recipe, {"type": "source"} as each site finishes and a final
+    {"type": "done"} record. Send "format": "sse" (or Accept:
+    text/event-stream) for server-sent events instead.
+    """
+    try:
+        data = request.get_json() or {}
+        query = data.get('query', 'chicken recipes')
+        max_recipes = data.get('max_recipes', 10)
+        parallel = data.get('parallel', True)
+        deadline = requested_deadline(data)
+        if PREWARM_ENABLED:
+            prewarm_crawler.log_search(query, max_recipes)
+        
+        job = scrape_job_manager.submit(query, max_recipes, deadline=deadline, parallel=parallel)
+        
+        if data.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(
+                stream_job_events(job),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Job-Id': job.id}
+            )
+        return Response(
+            stream_job_ndjson(job),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Job-Id': job.id}
+        )
         
-        for i, card in enumerate(recipe_cards):
-            try:
-                print(f"Processing Epicurious recipe card {i+1}/{len(recipe_cards)}")
-                
-                # Try different ways to extract title and link
-                title = None
-                recipe_url = None
-                
-                # Method 1: Look for title in h3 or similar elements
-                title_elem = card.find(['h3', 'h2', 'h1'])
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                
-                # Method 2: Look for title in class names
-                if not title:
-                    title_elem = card.find(class_=re.compile(r'title|headline|name'))
-                    if title_elem:
-                        title = title_elem.get_text(strip=True)
-                
-                # Method 3: Look for title in any text content
-                if not title:
-                    title = card.get_text(strip=True)[:100]  # First 100 chars
-                
-                # Find recipe URL - improved logic
-                if card.name == 'a':
-                    recipe_url = card.get('href')
-                else:
-                    link_elem = card.find('a')
-                    if link_elem:
-                        recipe_url = link_elem.get('href')
-                
-                # Make URL absolute and clean it
-                if recipe_url:
-                    if not recipe_url.startswith('http'):
-                        if recipe_url.startswith('/'):
-                            recipe_url = 'https://www.epicurious.com' + recipe_url
-                        else:
-                            recipe_url = 'https://www.epicurious.com/' + recipe_url
-                    
-                    # Only process if it's actually a recipe URL
-                    if '/recipes/' not in recipe_url:
-                        continue
-                
-                print(f"Title: {title}")
-                print(f"URL: {recipe_url}")
-                
-                if recipe_url and title and '/recipes/' in recipe_url:
-                    # Get detailed recipe info
-                    recipe_details = get_recipe_details(recipe_url, headers)
-                    if recipe_details:
-                        recipes.append(recipe_details)
-                        print(f"Successfully added recipe: {recipe_details['title']}")
-                    else:
-                        print(f"Failed to get details for: {title}")
-                    
-                    # Add a small delay to be respectful to the website
-                    time.sleep(1)
-                        
-            except Exception as e:
-                print(f"Error processing Epicurious recipe card {i+1}: {e}")
-                continue
-                
     except Exception as e:
-        print(f"Error scraping Epicurious: {e}")
+        print(f"Error in stream_scrape_recipes: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scrape-jobs/<job_id>', methods=['GET'])
+def get_scrape_job(job_id):
+    """Poll a scrape job; ?since=<seq> also returns the events after that sequence number"""
+    job = scrape_job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
     
-    print(f"Epicurious scraping completed. Found {len(recipes)} recipes.")
-    return recipes
+    result = job.to_dict()
+    since = request.args.get('since', type=int)
+    if since is not None:
+        result['events'] = job.events_after(since)
+    return jsonify({'success': True, 'job': result})
+
+@app.route('/api/scrape-jobs/<job_id>/events', methods=['GET'])
+def stream_scrape_job(job_id):
+    """Follow a scrape job as a server-sent-events stream"""
+    job = scrape_job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    # EventSource sends Last-Event-ID when it reconnects
+    last_seq = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', 0, type=int)
+    return Response(
+        stream_job_events(job, last_seq),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def record_fetch(stage, response):
+    fetch_responses.inc(stage=stage, status=response.status_code)
+    # Partial bodies served from the cache were already counted when they were downloaded
+    if not response.from_cache:
+        fetch_bytes.inc(len(response.content), stage=stage)
+        if response.stop_reason:
+            fetch_truncations.inc(stage=stage, reason=response.stop_reason)
+
+def record_extraction_method(method):
+    with extraction_stats_lock:
+        extraction_stats[method] = extraction_stats.get(method, 0) + 1
+    extractions.inc(method=method)
 
-def get_recipe_details(url, headers):
+def get_recipe_details(url, headers=None, validate_image=True):
+    """Fetch and extract one recipe page.
+
+    With validate_image=False the image URL is left unchecked (and may be
+    None) so the caller can validate images for a whole batch at once with
+    resolve_recipe_images.
+    """
     try:
         print(f"Getting recipe details from: {url}")
-        response = requests.get(url, headers=headers, timeout=15)
+        with track_stage('detail_fetch'):
+            response = fetch_client.get_cached(url, headers=headers,
+                                               stop_when=RecipeMarkupScanner() if STREAM_EARLY_STOP else None)
+        record_fetch('detail_fetch', response)
         
         if response.status_code != 200:
             print(f"Failed to get recipe page: {response.status_code}")
             return None
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract recipe information
-        title = None
-        
-        # Try multiple selectors for title - expanded for better coverage
-        title_selectors = [
-            'h1',
-            'h1[class*="title"]',
-            'h1[class*="recipe"]',
-            'h1[class*="headline"]',
-            'h1[class*="main"]',
-            'h2[class*="title"]',
-            'h2[class*="recipe"]',
-            'h2[class*="headline"]',
-            'h3[class*="title"]',
-            'h3[class*="recipe"]',
-            '[class*="recipe-title"]',
-            '[class*="recipe-headline"]',
-            '[class*="main-title"]'
-        ]
-        
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.get_text(strip=True)
-                if title and len(title) > 3:
-                    break
-        
-        if not title:
-            title = 'Unknown Recipe'
-        
-        print(f"Extracted title: {title}")
-        
-        # Extract ingredients - improved selectors
-        ingredients = []
-        ingredient_selectors = [
-            '[class*="ingredient"]',
-            '[class*="ingredients"]',
-            'li[class*="ingredient"]',
-            'span[class*="ingredient"]',
-            'div[class*="ingredient"]',
-            '[class*="ingredients-list"] li',
-            '[class*="ingredient-list"] li',
-            '[class*="recipe-ingredients"] li'
-        ]
-        
-        for selector in ingredient_selectors:
-            ingredient_elements = soup.select(selector)
-            if ingredient_elements:
-                for elem in ingredient_elements:
-                    ingredient_text = elem.get_text(strip=True)
-                    if ingredient_text and len(ingredient_text) > 3 and len(ingredient_text) < 200:
-                        # Clean up the ingredient text
-                        clean_text = re.sub(r'\s+', ' ', ingredient_text).strip()
-                        if clean_text and clean_text not in ingredients:
-                            ingredients.append(clean_text)
-                if ingredients:
-                    break
-        
-        # If no ingredients found, try a more generic approach
-        if not ingredients:
-            # Look for lists that might contain ingredients
-            lists = soup.find_all(['ul', 'ol'])
-            for lst in lists:
-                items = lst.find_all('li')
-                for item in items:
-                    text = item.get_text(strip=True)
-                    if text and len(text) > 5 and len(text) < 200:
-                        # Check if this looks like an ingredient
-                        text_lower = text.lower()
-                        if not any(word in text_lower for word in ['step', 'instruction', 'direction', 'preheat', 'heat', 'cook', 'bake', 'grill', 'fry', 'simmer', 'boil']):
-                            clean_text = re.sub(r'\s+', ' ', text).strip()
-                            if clean_text and clean_text not in ingredients:
-                                ingredients.append(clean_text)
-        
-        print(f"Extracted {len(ingredients)} ingredients")
-        
-        # Extract instructions - improved selectors
-        instructions = []
-        instruction_selectors = [
-            '[class*="instruction"]',
-            '[class*="directions"]',
-            '[class*="steps"]',
-            '[class*="method"]',
-            'li[class*="step"]',
-            'p[class*="instruction"]',
-            '[class*="recipe-instructions"] li',
-            '[class*="recipe-directions"] li',
-            '[class*="cooking-steps"] li'
-        ]
-        
-        for selector in instruction_selectors:
-            instruction_elements = soup.select(selector)
-            if instruction_elements:
-                for elem in instruction_elements:
-                    instruction_text = elem.get_text(strip=True)
-                    if instruction_text and len(instruction_text) > 10 and len(instruction_text) < 500:
-                        clean_text = re.sub(r'\s+', ' ', instruction_text).strip()
-                        if clean_text and clean_text not in instructions:
-                            instructions.append(clean_text)
-                if instructions:
-                    break
-        
-        # If no instructions found, try a more generic approach
-        if not instructions:
-            # Look for paragraphs that might contain instructions
-            paragraphs = soup.find_all('p')
-            for p in paragraphs:
-                text = p.get_text(strip=True)
-                if text and len(text) > 20 and len(text) < 500:
-                    text_lower = text.lower()
-                    if any(word in text_lower for word in ['preheat', 'heat', 'cook', 'add', 'stir', 'mix', 'bake', 'grill', 'fry', 'simmer', 'boil', 'season', 'combine']):
-                        clean_text = re.sub(r'\s+', ' ', text).strip()
-                        if clean_text and clean_text not in instructions:
-                            instructions.append(clean_text)
-        
-        print(f"Extracted {len(instructions)} instructions")
-        
-        # Extract image - enhanced selectors for better image quality
-        image_url = None
-        image_selectors = [
-            # High priority - recipe-specific images
-            'img[class*="recipe"]',
-            'img[class*="food"]',
-            'img[class*="hero"]',
-            'img[class*="main"]',
-            'img[class*="featured"]',
-            'img[class*="primary"]',
-            'img[class*="lead"]',
-            '[class*="recipe-image"] img',
-            '[class*="hero-image"] img',
-            '[class*="main-image"] img',
-            '[class*="featured-image"] img',
-            '[class*="lead-image"] img',
-            # Medium priority - general content images
-            'img[class*="content"]',
-            'img[class*="article"]',
-            'img[class*="post"]',
-            '[class*="content-image"] img',
-            '[class*="article-image"] img',
-            # Low priority - any image with food-related attributes
-            'img[alt*="recipe"]',
-            'img[alt*="food"]',
-            'img[alt*="dish"]',
-            'img[alt*="cooking"]',
-            'img[alt*="meal"]'
-        ]
-        
-        # Try to find the best quality image
-        best_image = None
-        best_score = 0
-        
-        for selector in image_selectors:
-            image_elements = soup.select(selector)
-            for img in image_elements:
-                src = img.get('src')
-                if not src:
-                    continue
-                
-                # Score the image based on various factors
-                score = 0
-                
-                # Higher score for larger images (check width/height attributes)
-                width = img.get('width') or img.get('data-width')
-                height = img.get('height') or img.get('data-height')
-                if width and height:
-                    try:
-                        w, h = int(width), int(height)
-                        if w >= 400 and h >= 300:  # Good size
-                            score += 10
-                        elif w >= 300 and h >= 200:  # Acceptable size
-                            score += 5
-                    except ValueError:
-                        pass
-                
-                # Higher score for images with descriptive alt text
-                alt = img.get('alt', '').lower()
-                if any(word in alt for word in ['recipe', 'food', 'dish', 'cooking', 'meal', 'delicious']):
-                    score += 8
-                
-                # Higher score for images with specific classes
-                img_class = img.get('class', [])
-                if any('recipe' in cls.lower() for cls in img_class):
-                    score += 6
-                if any('hero' in cls.lower() or 'main' in cls.lower() for cls in img_class):
-                    score += 4
-                
-                # Higher score for images that are likely the main image
-                if img.find_parent(['header', 'article', 'main']):
-                    score += 3
-                
-                # Check if this is a better image than what we have
-                if score > best_score:
-                    best_score = score
-                    best_image = img
-        
-        # Use the best image found, or fall back to simpler selection
-        if best_image and best_image.get('src'):
-            image_url = best_image['src']
-        else:
-            # Fallback: try to find any reasonable image
-            images = soup.find_all('img')
-            for img in images:
-                src = img.get('src')
-                if src and len(src) > 10:  # Avoid very short URLs
-                    # Skip common non-recipe images
-                    skip_patterns = ['logo', 'icon', 'avatar', 'banner', 'ad', 'sponsor']
-                    if not any(pattern in src.lower() for pattern in skip_patterns):
-                        image_url = src
-                        break
-        
-        # Make image URL absolute if it's relative
-        if image_url:
-            if image_url.startswith('//'):
-                image_url = 'https:' + image_url
-            elif image_url.startswith('/'):
-                base_url = '/'.join(url.split('/')[:3])  # Get domain
-                image_url = base_url + image_url
-            elif not image_url.startswith('http'):
-                base_url = '/'.join(url.split('/')[:-1])  # Get directory
-                image_url = base_url + '/' + image_url
-            
-            # Clean up the URL (remove query parameters that might cause issues)
-            if '?' in image_url:
-                base_img_url = image_url.split('?')[0]
-                # Keep the URL if it looks like a proper image
-                if any(ext in base_img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']):
-                    image_url = base_img_url
-        
-        # Site-specific image extraction fallbacks
-        if not image_url:
-            domain = url.lower()
-            if 'allrecipes.com' in domain:
-                # AllRecipes specific selectors
-                allrecipes_selectors = [
-                    'img[data-src*="recipe"]',
-                    'img[data-src*="food"]',
-                    'img[data-lazy-src]',
-                    '[class*="lead-media"] img',
-                    '[class*="recipe-media"] img'
-                ]
-                for selector in allrecipes_selectors:
-                    img_elem = soup.select_one(selector)
-                    if img_elem:
-                        src = img_elem.get('data-src') or img_elem.get('data-lazy-src') or img_elem.get('src')
-                        if src:
-                            image_url = src
-                            break
-                            
-            elif 'foodnetwork.com' in domain:
-                # Food Network specific selectors
-                foodnetwork_selectors = [
-                    'img[data-src*="recipe"]',
-                    'img[data-src*="food"]',
-                    '[class*="lead-media"] img',
-                    '[class*="recipe-media"] img',
-                    '[class*="hero-media"] img'
-                ]
-                for selector in foodnetwork_selectors:
-                    img_elem = soup.select_one(selector)
-                    if img_elem:
-                        src = img_elem.get('data-src') or img_elem.get('src')
-                        if src:
-                            image_url = src
-                            break
-                            
-            elif 'epicurious.com' in domain:
-                # Epicurious specific selectors
-                epicurious_selectors = [
-                    'img[data-src*="recipe"]',
-                    'img[data-src*="food"]',
-                    '[class*="lead-media"] img',
-                    '[class*="recipe-media"] img',
-                    '[class*="hero-media"] img'
-                ]
-                for selector in epicurious_selectors:
-                    img_elem = soup.select_one(selector)
-                    if img_elem:
-                        src = img_elem.get('data-src') or img_elem.get('src')
-                        if src:
-                            image_url = src
-                            break
-            
-            # Make the site-specific image URL absolute if needed
-            if image_url and not image_url.startswith('http'):
-                if image_url.startswith('//'):
-                    image_url = 'https:' + image_url
-                elif image_url.startswith('/'):
-                    base_url = '/'.join(url.split('/')[:3])
-                    image_url = base_url + image_url
-                else:
-                    base_url = '/'.join(url.split('/')[:-1])
-                    image_url = base_url + '/' + image_url
-        
-        # Additional fallback: Look for images in meta tags (Open Graph, Twitter Cards)
-        if not image_url:
-            meta_selectors = [
-                'meta[property="og:image"]',
-                'meta[name="twitter:image"]',
-                'meta[property="og:image:secure_url"]',
-                'meta[name="image"]'
-            ]
-            for selector in meta_selectors:
-                meta_elem = soup.select_one(selector)
-                if meta_elem:
-                    content = meta_elem.get('content')
-                    if content and content.startswith(('http://', 'https://')):
-                        image_url = content
-                        print(f"Found image in meta tag: {image_url}")
-                        break
-        
-        # Additional fallback: Look for images in JSON-LD structured data
-        if not image_url:
-            json_ld_scripts = soup.find_all('script', type='application/ld+json')
-            for script in json_ld_scripts:
-                try:
-                    json_data = json.loads(script.string)
-                    if isinstance(json_data, dict):
-                        # Look for image in various JSON-LD structures
-                        if 'image' in json_data:
-                            if isinstance(json_data['image'], str):
-                                image_url = json_data['image']
-                                break
-                            elif isinstance(json_data['image'], dict) and 'url' in json_data['image']:
-                                image_url = json_data['image']['url']
-                                break
-                            elif isinstance(json_data['image'], list) and len(json_data['image']) > 0:
-                                if isinstance(json_data['image'][0], str):
-                                    image_url = json_data['image'][0]
-                                    break
-                                elif isinstance(json_data['image'][0], dict) and 'url' in json_data['image'][0]:
-                                    image_url = json_data['image'][0]['url']
-                                    break
-                except (json.JSONDecodeError, KeyError, TypeError):
-                    continue
-        
+        # Structured data first, then the selector cascade over the recipe containers
+        with track_stage('html_parse'):
+            details = extract_recipe(response.content, url, json_ld_first=JSON_LD_FIRST,
+                                     selector_stats=selector_stats)
+        
+        # The recipe may continue past where the download stopped; read the whole page
+        if response.stop_reason == 'early_stop' and not is_complete(details):
+            print(f"Early stop missed the recipe, fetching the full page: {url}")
+            with track_stage('detail_fetch'):
+                response = fetch_client.get_cached(url, headers=headers)
+            record_fetch('detail_fetch', response)
+            if response.status_code != 200:
+                return None
+            with track_stage('html_parse'):
+                details = extract_recipe(response.content, url, json_ld_first=JSON_LD_FIRST,
+                                         selector_stats=selector_stats)
+        extraction_method = details['extraction_method']
+        title = details['title'] or 'Unknown Recipe'
+        ingredients = details['ingredients']
+        instructions = details['instructions']
+        image_url = details['image_url']
+        recipe_yield = details['recipe_yield']
+        nutrition = details['nutrition']
+        print(f"Extracted {len(ingredients)} ingredients, {len(instructions)} instructions")
+        
+        record_extraction_method(extraction_method)
+        print(f"Extracted recipe via {extraction_method}: {title}")
         print(f"Extracted image: {image_url}")
         
-        # Optimize the image URL for better performance
-        if image_url:
-            image_url = validate_and_optimize_image_url(image_url)
-            print(f"Optimized image URL: {image_url}")
-            
-            # Test if the image URL is actually accessible
-            if not test_image_url(image_url):
-                print(f"Image URL not accessible, using fallback: {image_url}")
-                image_url = get_fallback_image_url(title, ingredients)
-        else:
-            # Provide a fallback image based on recipe content
-            image_url = get_fallback_image_url(title, ingredients)
-            print(f"Using fallback image: {image_url}")
-        
         # If we don't have enough data, return None
         if len(ingredients) < 2 or len(instructions) < 1:
             print(f"Insufficient data: {len(ingredients)} ingredients, {len(instructions)} instructions")
             return None
         
-        return {
+        # Optimize the image URL for better performance
+        if image_url:
+            image_url = validate_and_optimize_image_url(image_url)
+            print(f"Optimized image URL: {image_url}")
+        
+        recipe = {
             'title': title,
             'ingredients': ingredients,
             'instructions': instructions,
             'image_url': image_url,
-            'source_url': url  # This will be the actual recipe URL, not example.com
+            'source_url': url,  # This will be the actual recipe URL, not example.com
+            'recipe_yield': recipe_yield,
+            'nutrition_info': nutrition,
+            'extraction_method': extraction_method
         }
         
+        if validate_image:
+            resolve_recipe_images([recipe])
+        return recipe
+        
     except Exception as e:
         print(f"Error getting recipe details from {url}: {e}")
         return None
 
 def save_recipe_to_db(recipe):
-    conn = sqlite3.connect('recipes.db')
-    cursor = conn.cursor()
+    return save_recipes_to_db([recipe])[0]
+
+def save_recipes_to_db(recipes):
+    """Upsert recipes in one transaction and return their ids, in the order given"""
+    if not recipes:
+        return []
     
-    cursor.execute('''
-        INSERT INTO recipes (title, ingredients, instructions, image_url, source_url)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
-        recipe['title'],
-        json.dumps(recipe['ingredients']),
-        json.dumps(recipe['instructions']),
-        recipe.get('image_url'),
-        recipe.get('source_url')
-    ))
+    with track_stage('db_write'):
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Upsert on source_url so re-scraping a recipe refreshes the existing row
+            rows = []
+            for recipe in recipes:
+                nutrition_info = recipe.get('nutrition_info')
+                rows.append((
+                    recipe['title'],
+                    json.dumps(recipe['ingredients']),
+                    json.dumps(recipe['instructions']),
+                    json.dumps(nutrition_info) if nutrition_info else None,
+                    recipe.get('image_url'),
+                    recipe.get('source_url'),
+                    recipe.get('recipe_yield')
+                ))
+            cursor.executemany(RECIPE_UPSERT_SQL, [row for row in rows if row[5]])
+            
+            # lastrowid is not reliable when the upsert took the UPDATE branch, so look the ids up
+            urls = list({recipe['source_url'] for recipe in recipes if recipe.get('source_url')})
+            ids_by_url = {}
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT source_url, id FROM recipes WHERE source_url IN ({placeholders})', chunk)
+                ids_by_url.update(cursor.fetchall())
+            
+            recipe_ids = []
+            for recipe, row in zip(recipes, rows):
+                if row[5]:
+                    recipe_ids.append(ids_by_url[row[5]])
+                else:
+                    # Without a source_url there is nothing to look up by
+                    cursor.execute(RECIPE_UPSERT_SQL, row)
+                    recipe_ids.append(cursor.lastrowid)
+            save_recipe_ingredients(cursor, [(recipe_id, recipe['ingredients'])
+                                             for recipe_id, recipe in zip(recipe_ids, recipes)])
+            conn.commit()
+        pantry_index.mark_changed(recipe_ids)
+        
+        return recipe_ids
+
+def get_recipes_by_source_urls(urls):
+    """Return {source_url: recipe} for the given URLs that are already stored"""
+    if not urls:
+        return {}
     
-    recipe_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(urls))
+        cursor.execute(f'''
+            SELECT id, title, ingredients, instructions, image_url, source_url
+            FROM recipes WHERE source_url IN ({placeholders})
+        ''', list(urls))
+        rows = cursor.fetchall()
+    
+    known = {}
+    for row in rows:
+        known[row[5]] = {
+            'id': row[0],
+            'title': row[1],
+            'ingredients': json.loads(row[2]),
+            'instructions': json.loads(row[3]),
+            'image_url': row[4],
+            'source_url': row[5]
+        }
+    return known
+
+def get_recipes_by_ids(recipe_ids):
+    """Return the stored recipes with the given ids, in the order given"""
+    if not recipe_ids:
+        return []
     
-    return recipe_id
+    with database.connection() as conn:
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(recipe_ids))
+        cursor.execute(f'''
+            SELECT id, title, ingredients, instructions, image_url, source_url, recipe_yield
+            FROM recipes WHERE id IN ({placeholders})
+        ''', list(recipe_ids))
+        rows = cursor.fetchall()
+    
+    by_id = {}
+    for row in rows:
+        by_id[row[0]] = {
+            'id': row[0],
+            'title': row[1],
+            'ingredients': json.loads(row[2]),
+            'instructions': json.loads(row[3]),
+            'image_url': row[4],
+            'source_url': row[5],
+            'recipe_yield': row[6]
+        }
+    return [by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in by_id]
+
+# Fields a client can ask for with ?fields=, as (SQL expression, decoder for the stored value)
+RECIPE_FIELDS = {
+    'id': ('id', None),
+    'title': ('title', None),
+    'ingredients': ('ingredients', json.loads),
+    'instructions': ('instructions', json.loads),
+    'nutrition_info': ('nutrition_info', None),
+    'image_url': ('image_url', None),
+    'source_url': ('source_url', None),
+    'created_at': ('created_at', None),
+    'recipe_yield': ('recipe_yield', None),
+    # Counted by SQLite, so the arrays themselves are never sent or decoded
+    'ingredient_count': ('json_array_length(ingredients)', None),
+    'instruction_count': ('json_array_length(instructions)', None)
+}
+DEFAULT_RECIPE_FIELDS = ['id', 'title', 'ingredients', 'instructions', 'nutrition_info', 'image_url',
+                         'source_url', 'created_at', 'recipe_yield']
+# ?view=compact: what a recipe card or the swiper needs
+COMPACT_RECIPE_FIELDS = ['id', 'title', 'image_url', 'ingredient_count']
+
+def requested_recipe_fields(args):
+    """The fields named by ?fields= or ?view=compact, the full recipe otherwise; ValueError for unknown ones"""
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in RECIPE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # id always comes back so results can be acted on
+        return ['id'] + [field for field in dict.fromkeys(fields) if field != 'id']
+    if args.get('view') == 'compact':
+        return COMPACT_RECIPE_FIELDS
+    if args.get('view', 'full') != 'full':
+        raise ValueError(f"Unknown view: {args['view']}")
+    return DEFAULT_RECIPE_FIELDS
+
+def recipe_columns(fields):
+    return ', '.join(RECIPE_FIELDS[field][0] for field in fields)
+
+def recipe_from_row(fields, row):
+    """Build a recipe dict from a row selected with recipe_columns(fields)"""
+    recipe = {}
+    for field, value in zip(fields, row):
+        decode = RECIPE_FIELDS[field][1]
+        recipe[field] = decode(value) if decode and value is not None else value
+    return recipe
+
+def encode_cursor(*values):
+    """Opaque pagination cursor holding the position after the last returned row"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, *types):
+    """The values of a cursor made by encode_cursor, checked against types; ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types) or \
+            not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise ValueError('Invalid cursor')
+    return tuple(values)
 
 @app.route('/api/recipes', methods=['GET'])
 def get_recipes():
+    """Stored recipes, newest first, one page at a time.
+
+    ?limit= sets the page size (up to RECIPES_MAX_PAGE_SIZE); pass the
+    returned next_cursor as ?cursor= to get the following page. next_cursor
+    is null on the last page. ?fields=title,image_url,... or ?view=compact
+    select only some fields; columns that are not asked for are not read.
+    """
     try:
-        conn = sqlite3.connect('recipes.db')
-        cursor = conn.cursor()
+        limit = min(max(request.args.get('limit', RECIPES_PAGE_SIZE, type=int), 1), RECIPES_MAX_PAGE_SIZE)
+        after = None
+        try:
+            fields = requested_recipe_fields(request.args)
+            if request.args.get('cursor'):
+                after = decode_cursor(request.args['cursor'], str, int)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        cursor.execute('SELECT * FROM recipes ORDER BY created_at DESC')
-        rows = cursor.fetchall()
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Keyset pagination: seek past the last row of the previous page on the
+            # (created_at, id) index instead of counting rows with OFFSET; the
+            # last two columns are only there to build the next cursor
+            columns = recipe_columns(fields) + ', created_at, id'
+            if after:
+                cursor.execute(f'''
+                    SELECT {columns} FROM recipes
+                    WHERE (created_at, id) < (?, ?)
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                ''', (after[0], after[1], limit + 1))
+            else:
+                cursor.execute(f'SELECT {columns} FROM recipes ORDER BY created_at DESC, id DESC LIMIT ?',
+                               (limit + 1,))
+            rows = cursor.fetchall()
         
-        recipes = []
-        for row in rows:
-            recipes.append({
-                'id': row[0],
-                'title': row[1],
-                'ingredients': json.loads(row[2]),
-                'instructions': json.loads(row[3]),
-                'nutrition_info': row[4],
-                'image_url': row[5],
-                'source_url': row[6],
-                'created_at': row[7]
-            })
+        # The extra row only tells us whether there is another page
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        recipes = [recipe_from_row(fields, row) for row in rows]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1]) if has_more else None
+        return jsonify({'success': True, 'recipes': recipes, 'limit': limit, 'next_cursor': next_cursor})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# bm25 column weights for recipes_fts: a match in the title counts most, then ingredients
+SEARCH_WEIGHTS = (10.0, 4.0, 1.0)
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix
+
+    Words are quoted, so FTS5 operators and syntax in user input are matched as plain text.
+    """
+    terms = SEARCH_TERM_RE.findall((text or '').lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+@app.route('/api/recipes/search', methods=['GET'])
+def search_recipes():
+    """Full-text search over stored recipes, best matches first.
+
+    ?q= is matched against title, ingredients and instructions. Takes the
+    same limit, cursor, fields and view parameters as /api/recipes.
+    """
+    try:
+        match = fts_query(request.args.get('q'))
+        if not match:
+            return jsonify({'success': False, 'error': 'q is required'}), 400
+        limit = min(max(request.args.get('limit', RECIPES_PAGE_SIZE, type=int), 1), RECIPES_MAX_PAGE_SIZE)
+        offset = 0
+        try:
+            fields = requested_recipe_fields(request.args)
+            if request.args.get('cursor'):
+                offset, = decode_cursor(request.args['cursor'], int)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Every match has to be scored to rank them, so paging by offset costs no more than a
+            # keyset would; only the requested page is joined back to recipes
+            cursor.execute(f'''
+                SELECT {recipe_columns(fields)} FROM (
+                    SELECT rowid, bm25(recipes_fts, ?, ?, ?) AS score FROM recipes_fts
+                    WHERE recipes_fts MATCH ?
+                    ORDER BY score, rowid LIMIT ? OFFSET ?
+                ) AS hits JOIN recipes ON recipes.id = hits.rowid
+                ORDER BY hits.score, hits.rowid
+            ''', (*SEARCH_WEIGHTS, match, limit + 1, offset))
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        recipes = [recipe_from_row(fields, row) for row in rows[:limit]]
+        next_cursor = encode_cursor(offset + limit) if has_more else None
+        return jsonify({'success': True, 'recipes': recipes, 'limit': limit, 'next_cursor': next_cursor})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/recipes/by-ingredient', methods=['GET'])
+def get_recipes_by_ingredient():
+    """Stored recipes that use every ?name= ingredient, most recently added first.
+
+    Names are normalized like parsed ingredient lines ("Tomatoes" matches
+    "2 large tomatoes, diced") and matched on the recipe_ingredients name
+    index. Takes the same limit, cursor, fields and view parameters as
+    /api/recipes.
+    """
+    try:
+        names = sorted({normalize_name(name) for name in request.args.getlist('name')} - {''})
+        if not names:
+            return jsonify({'success': False, 'error': 'name is required'}), 400
+        limit = min(max(request.args.get('limit', RECIPES_PAGE_SIZE, type=int), 1), RECIPES_MAX_PAGE_SIZE)
+        before = None
+        try:
+            fields = requested_recipe_fields(request.args)
+            if request.args.get('cursor'):
+                before, = decode_cursor(request.args['cursor'], int)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        conn.close()
-        return jsonify({'success': True, 'recipes': recipes})
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            placeholders = ','.join('?' * len(names))
+            cursor.execute(f'''
+                SELECT {recipe_columns(fields)}, id FROM recipes WHERE id IN (
+                    SELECT recipe_id FROM recipe_ingredients
+                    WHERE name IN ({placeholders}) AND recipe_id < ?
+                    GROUP BY recipe_id HAVING COUNT(DISTINCT name) = ?
+                    ORDER BY recipe_id DESC LIMIT ?
+                )
+                ORDER BY id DESC
+            ''', (*names, before if before is not None else 2 ** 63 - 1, len(names), limit + 1))
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        recipes = [recipe_from_row(fields, row) for row in rows]
+        next_cursor = encode_cursor(rows[-1][-1]) if has_more else None
+        return jsonify({'success': True, 'recipes': recipes, 'ingredients': names, 'limit': limit,
+                        'next_cursor': next_cursor})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -920,12 +1148,11 @@ def get_recipes():
 @app.route('/api/recipes/<int:recipe_id>/nutrition', methods=['GET'])
 def get_recipe_nutrition(recipe_id):
     try:
-        conn = sqlite3.connect('recipes.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT ingredients FROM recipes WHERE id = ?', (recipe_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT ingredients FROM recipes WHERE id = ?', (recipe_id,))
+            row = cursor.fetchone()
         
         if not row:
             return jsonify({'success': False, 'error': 'Recipe not found'}), 404
@@ -936,12 +1163,11 @@ def get_recipe_nutrition(recipe_id):
         nutrition_data = get_nutrition_data(ingredients)
         
         # Update recipe with nutrition info
-        conn = sqlite3.connect('recipes.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE recipes SET nutrition_info = ? WHERE id = ?', 
-                      (json.dumps(nutrition_data), recipe_id))
-        conn.commit()
-        conn.close()
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE recipes SET nutrition_info = ? WHERE id = ?', 
+                          (json.dumps(nutrition_data), recipe_id))
+            conn.commit()
         
         return jsonify({'success': True, 'nutrition': nutrition_data})
         
@@ -978,124 +1204,14 @@ def get_nutrition_data(ingredients):
     
     return nutrition
 
-def validate_and_optimize_image_url(image_url):
-    """Validate image URL and potentially optimize it for better performance"""
-    if not image_url:
-        return None
-    
-    try:
-        # Check if the URL is valid
-        if not image_url.startswith(('http://', 'https://')):
-            return None
-        
-        # For some sites, we can optimize the image URL for better performance
-        domain = image_url.lower()
-        
-        # AllRecipes image optimization
-        if 'allrecipes.com' in domain:
-            # AllRecipes often supports size parameters
-            if '?' not in image_url:
-                image_url += '?w=400&h=300&fit=crop'
-            elif 'w=' not in image_url:
-                image_url += '&w=400&h=300&fit=crop'
-        
-        # Food Network image optimization
-        elif 'foodnetwork.com' in domain:
-            # Food Network often supports size parameters
-            if '?' not in image_url:
-                image_url += '?w=400&h=300&fit=crop'
-            elif 'w=' not in image_url:
-                image_url += '&w=400&h=300&fit=crop'
-        
-        # Epicurious image optimization
-        elif 'epicurious.com' in domain:
-            # Epicurious often supports size parameters
-            if '?' not in image_url:
-                image_url += '?w=400&h=300&fit=crop'
-            elif 'w=' not in image_url:
-                image_url += '&w=400&h=300&fit=crop'
-        
-        # Generic image optimization for common image services
-        elif any(service in domain for service in ['unsplash.com', 'pexels.com', 'pixabay.com']):
-            # These services often support size parameters
-            if '?' not in image_url:
-                image_url += '?w=400&h=300&fit=crop'
-            elif 'w=' not in image_url:
-                image_url += '&w=400&h=300&fit=crop'
-        
-        return image_url
-        
-    except Exception as e:
-        print(f"Error optimizing image URL {image_url}: {e}")
-        return image_url  # Return original URL if optimization fails
-
-def get_fallback_image_url(title, ingredients):
-    """Get a relevant fallback image based on recipe content"""
-    try:
-        # Convert to lowercase for easier matching
-        title_lower = title.lower()
-        ingredients_lower = [ing.lower() for ing in ingredients]
-        all_text = title_lower + ' ' + ' '.join(ingredients_lower)
-        
-        # Define fallback images for different food categories
-        fallback_images = {
-            # Chicken dishes
-            'chicken': 'https://images.unsplash.com/photo-1604503468506-a8da13d82791?w=400&h=300&fit=crop',
-            # Pasta dishes
-            'pasta': 'https://images.unsplash.com/photo-1621996346565-e3dbc353d2e5?w=400&h=300&fit=crop',
-            # Asian/Stir fry
-            'asian': 'https://images.unsplash.com/photo-1603133872878-684f208fb84b?w=400&h=300&fit=crop',
-            'stir': 'https://images.unsplash.com/photo-1603133872878-684f208fb84b?w=400&h=300&fit=crop',
-            # Vegetarian
-            'vegetarian': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
-            'vegan': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
-            # Mexican
-            'taco': 'https://images.unsplash.com/photo-1565299585323-38d6b0865b47?w=400&h=300&fit=crop',
-            'mexican': 'https://images.unsplash.com/photo-1565299585323-38d6b0865b47?w=400&h=300&fit=crop',
-            # Seafood
-            'fish': 'https://images.unsplash.com/photo-1519708227418-c8fd9a32b7a2?w=400&h=300&fit=crop',
-            'salmon': 'https://images.unsplash.com/photo-1519708227418-c8fd9a32b7a2?w=400&h=300&fit=crop',
-            # Desserts
-            'cake': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
-            'cookie': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
-            'dessert': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
-            # Breakfast
-            'breakfast': 'https://images.unsplash.com/photo-1493770348161-369560ae357d?w=400&h=300&fit=crop',
-            'pancake': 'https://images.unsplash.com/photo-1493770348161-369560ae357d?w=400&h=300&fit=crop',
-            # Salad
-            'salad': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
-            # Soup
-            'soup': 'https://images.unsplash.com/photo-1547592166-23ac45744acd?w=400&h=300&fit=crop',
-            # Pizza
-            'pizza': 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop',
-            # Burger
-            'burger': 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400&h=300&fit=crop',
-            # Steak
-            'steak': 'https://images.unsplash.com/photo-1546833999-b9f581a1996d?w=400&h=300&fit=crop',
-            'beef': 'https://images.unsplash.com/photo-1546833999-b9f581a1996d?w=400&h=300&fit=crop'
-        }
-        
-        # Try to match based on title and ingredients
-        for keyword, image_url in fallback_images.items():
-            if keyword in all_text:
-                return image_url
-        
-        # Default fallback image for general recipes
-        return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop'
-        
-    except Exception as e:
-        print(f"Error getting fallback image: {e}")
-        # Return a generic food image as ultimate fallback
-        return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop'
-
-def test_image_url(image_url, timeout=5):
+def test_image_url(image_url, timeout=IMAGE_CHECK_TIMEOUT):
     """Test if an image URL is accessible"""
     if not image_url:
         return False
     
     try:
         # Quick test to see if the image URL is accessible
-        response = requests.head(image_url, timeout=timeout, allow_redirects=True)
+        response = fetch_client.head(image_url, timeout=timeout, allow_redirects=True)
         if response.status_code == 200:
             content_type = response.headers.get('content-type', '').lower()
             if content_type.startswith('image/'):
@@ -1109,23 +1225,22 @@ def test_image_url(image_url, timeout=5):
 def manage_ingredients():
     if request.method == 'GET':
         try:
-            conn = sqlite3.connect('recipes.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM user_ingredients ORDER BY added_at DESC')
-            rows = cursor.fetchall()
-            
-            ingredients = []
-            for row in rows:
-                ingredients.append({
-                    'id': row[0],
-                    'ingredient_name': row[1],
-                    'quantity': row[2],
-                    'unit': row[3],
-                    'added_at': row[4]
-                })
-            
-            conn.close()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT * FROM user_ingredients ORDER BY added_at DESC')
+                rows = cursor.fetchall()
+                
+                ingredients = []
+                for row in rows:
+                    ingredients.append({
+                        'id': row[0],
+                        'ingredient_name': row[1],
+                        'quantity': row[2],
+                        'unit': row[3],
+                        'added_at': row[4]
+                    })
+                
             return jsonify({'success': True, 'ingredients': ingredients})
             
         except Exception as e:
@@ -1138,22 +1253,74 @@ def manage_ingredients():
             quantity = data.get('quantity', '1')
             unit = data.get('unit', 'piece')
             
-            conn = sqlite3.connect('recipes.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO user_ingredients (ingredient_name, quantity, unit)
-                VALUES (?, ?, ?)
-            ''', (ingredient_name, quantity, unit))
-            
-            conn.commit()
-            conn.close()
+            with database.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO user_ingredients (ingredient_name, quantity, unit)
+                    VALUES (?, ?, ?)
+                ''', (ingredient_name, quantity, unit))
+                
+                conn.commit()
             
             return jsonify({'success': True, 'message': 'Ingredient added successfully'})
             
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/pantry/matches', methods=['GET'])
+def get_pantry_matches():
+    """Stored recipes ranked by how many of their ingredients the pantry covers.
+
+    Each recipe comes with its coverage (0-1) and the ingredient lines still
+    missing. ?max_missing=0 lists only what can be cooked right now. Takes
+    the same limit, cursor, fields and view parameters as /api/recipes.
+    """
+    try:
+        limit = min(max(request.args.get('limit', RECIPES_PAGE_SIZE, type=int), 1), RECIPES_MAX_PAGE_SIZE)
+        max_missing = request.args.get('max_missing', type=int)
+        offset = 0
+        try:
+            fields = requested_recipe_fields(request.args)
+            if request.args.get('cursor'):
+                offset, = decode_cursor(request.args['cursor'], int)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        with database.connection() as conn:
+            pantry = pantry_names(conn)
+        # Rank one extra recipe to know whether there is another page
+        ranked = pantry_index.rank(pantry, offset + limit + 1, max_missing)
+        has_more = len(ranked) > offset + limit
+        ranked = ranked[offset:offset + limit]
+        recipe_ids = [recipe_id for recipe_id, _, _ in ranked]
+        
+        with database.connection() as conn:
+            placeholders = ','.join('?' * len(recipe_ids))
+            rows = conn.execute(f'SELECT {recipe_columns(fields)} FROM recipes WHERE id IN ({placeholders})',
+                                recipe_ids).fetchall() if recipe_ids else []
+            missing = missing_ingredients(conn, recipe_ids, pantry_index.covered_names(pantry))
+        
+        by_id = {recipe['id']: recipe for recipe in (recipe_from_row(fields, row) for row in rows)}
+        matches = []
+        for recipe_id, matched, total in ranked:
+            # Recipes deleted since the index was built are skipped
+            if recipe_id not in by_id:
+                continue
+            recipe = by_id[recipe_id]
+            recipe['coverage'] = round(matched / total, 3)
+            recipe['matched_count'] = matched
+            recipe['ingredient_total'] = total
+            recipe['missing_ingredients'] = missing[recipe_id]
+            matches.append(recipe)
+        
+        next_cursor = encode_cursor(offset + limit) if has_more else None
+        return jsonify({'success': True, 'pantry': pantry, 'recipes': matches, 'limit': limit,
+                        'next_cursor': next_cursor})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/instacart/checkout', methods=['POST'])
 def instacart_checkout():
     try:
@@ -1186,22 +1353,35 @@ def save_recipe(recipe_id):
         rating = data.get('rating', 5)
         notes = data.get('notes', '')
         
-        conn = sqlite3.connect('recipes.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO saved_recipes (recipe_id, user_rating, notes)
-            VALUES (?, ?, ?)
-        ''', (recipe_id, rating, notes))
-        
-        conn.commit()
-        conn.close()
+        with database.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO saved_recipes (recipe_id, user_rating, notes)
+                VALUES (?, ?, ?)
+            ''', (recipe_id, rating, notes))
+            
+            conn.commit()
         
         return jsonify({'success': True, 'message': 'Recipe saved successfully'})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/extraction-stats', methods=['GET'])
+def get_extraction_stats():
+    """How often the JSON-LD fast path was used versus the selector cascade"""
+    with extraction_stats_lock:
+        stats = dict(extraction_stats)
+    total = sum(stats.values())
+    return jsonify({
+        'success': True,
+        'counts': stats,
+        'total': total,
+        'json_ld_hit_rate': round(stats.get('json_ld', 0) / total, 3) if total else None,
+        'selectors': selector_stats.stats() if selector_stats else None
+    })
+
 @app.route('/api/test-image-extraction', methods=['POST'])
 def test_image_extraction():
     """Test image extraction from a specific URL for debugging"""
@@ -1212,26 +1392,15 @@ def test_image_extraction():
         if not url:
             return jsonify({'success': False, 'error': 'URL is required'}), 400
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0'
-        }
         
-        recipe_details = get_recipe_details(url, headers)
+        recipe_details = get_recipe_details(url)
         
         if recipe_details:
             return jsonify({
                 'success': True,
                 'recipe': recipe_details,
-                'image_extraction_success': bool(recipe_details.get('image_url'))
+                'image_extraction_success': bool(recipe_details.get('image_url')),
+                'extraction_method': recipe_details.get('extraction_method')
             })
         else:
             return jsonify({'success': False, 'error': 'Failed to extract recipe details'}), 500
@@ -0,0 +1,269 @@
+"""Offline benchmark for recipe page extraction.
+
+Runs recipe_extraction.extract_recipe over the recorded pages in
+benchmarks/fixtures and reports, per page, the median parse time, the
+peak memory allocated while parsing (tracemalloc) and how completely the
+result matches the page's golden output. Thresholds in thresholds.json
+turn slowdowns, memory growth and accuracy regressions into a non-zero
+exit status.
+
+Each fixture is a pair of files: <name>.html (the page as served) and
+<name>.json ({"url": ..., "expected": {...}}). The expected fields are
+the correct recipe, not necessarily what the extractor returns today, so
+pages the selectors only partly get right have a lower completeness
+floor in thresholds.json.
+
+Each page is also fed to RecipeMarkupScanner in small chunks, as a
+streaming download would be. A fixture can pin where that download
+stops with "stop": "json_ld" (at a Recipe block), "main" (at </main>) or
+"end" (never), and a page cut short must still extract as completely as
+the whole page.
+
+Usage:
+    python benchmarks/extraction_benchmark.py [--repeat 20] [--parser lxml] [--adaptive]
+    python benchmarks/extraction_benchmark.py --record URL NAME
+
+--record needs network access; everything else runs fully offline.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+THRESHOLDS_PATH = os.path.join(BENCHMARK_DIR, 'thresholds.json')
+
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+# Smaller than a real download's chunks, so where the scanner stops shows on small fixtures
+SCAN_CHUNK_BYTES = 4096
+
+# Fields that make up the completeness score; list fields are scored by F1
+SCALAR_FIELDS = ['title', 'image_url', 'recipe_yield', 'nutrition']
+LIST_FIELDS = ['ingredients', 'instructions']
+
+
+def normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    return value
+
+
+def list_f1(expected, actual):
+    """F1 of actual lines against expected ones, so both misses and junk lines cost"""
+    expected = [normalize(item) for item in expected]
+    actual = [normalize(item) for item in actual or []]
+    if not expected:
+        return 1.0 if not actual else 0.0
+    matched = len(set(expected) & set(actual))
+    if not matched:
+        return 0.0
+    precision = matched / len(actual)
+    recall = matched / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def field_scores(expected, actual):
+    """Score every field the golden output defines, from 0.0 to 1.0"""
+    scores = {}
+    for field in SCALAR_FIELDS:
+        if expected.get(field) is not None:
+            scores[field] = 1.0 if normalize(actual.get(field)) == normalize(expected[field]) else 0.0
+    for field in LIST_FIELDS:
+        scores[field] = list_f1(expected.get(field, []), actual.get(field))
+    return scores
+
+
+def load_fixtures(name_filter=None):
+    fixtures = []
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        name, ext = os.path.splitext(filename)
+        if ext != '.html' or (name_filter and name_filter not in name):
+            continue
+        with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+            content = f.read()
+        with open(os.path.join(FIXTURES_DIR, name + '.json'), encoding='utf-8') as f:
+            golden = json.load(f)
+        fixtures.append((name, content, golden))
+    return fixtures
+
+
+def load_thresholds():
+    with open(THRESHOLDS_PATH, encoding='utf-8') as f:
+        thresholds = json.load(f)
+    defaults = thresholds.get('defaults', {})
+    pages = thresholds.get('pages', {})
+    return lambda name: dict(defaults, **pages.get(name, {}))
+
+
+def benchmark_page(extract, content, url, repeat, warmup=1):
+    # Warm up selector and regex caches (and, in adaptive mode, learn the site's selectors)
+    for _ in range(warmup):
+        extract(content, url)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extract(content, url)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Measured separately: tracing slows the parse down considerably
+    tracemalloc.start()
+    try:
+        result = extract(content, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, statistics.median(timings), peak / 1024
+
+
+def early_stop(content):
+    """Bytes a streaming download with RecipeMarkupScanner reads, and where it stopped"""
+    from recipe_extraction import MAIN_CLOSE_RE, RecipeMarkupScanner
+
+    scanner = RecipeMarkupScanner()
+    body = bytearray()
+    for start in range(0, len(content), SCAN_CHUNK_BYTES):
+        body += content[start:start + SCAN_CHUNK_BYTES]
+        if scanner(body):
+            main_end = MAIN_CLOSE_RE.search(content)
+            return len(body), 'main' if main_end and len(body) >= main_end.end() else 'json_ld'
+    return len(content), 'end'
+
+
+def run(args):
+    if args.parser:
+        # recipe_extraction resolves its parser at import time
+        os.environ['HTML_PARSER'] = args.parser
+    from recipe_extraction import HTML_PARSER, extract_recipe
+    from selector_stats import SelectorStats
+
+    # In-memory only: the benchmark never touches recipes.db
+    selector_stats = SelectorStats() if args.adaptive else None
+    warmup = selector_stats.min_hits + 1 if selector_stats else 1
+
+    def extract(content, url):
+        return extract_recipe(content, url, json_ld_first=not args.selectors_first,
+                              partial=not args.no_partial, selector_stats=selector_stats)
+
+    fixtures = load_fixtures(args.filter)
+    if not fixtures:
+        print(f"No fixtures found in {FIXTURES_DIR}")
+        return 1
+    thresholds_for = load_thresholds()
+
+    results = []
+    for name, content, golden in fixtures:
+        expected = golden['expected']
+        result, median_ms, peak_kb = benchmark_page(extract, content, golden['url'], args.repeat, warmup)
+        scores = field_scores(expected, result)
+        completeness = sum(scores.values()) / len(scores)
+        limits = thresholds_for(name)
+        read_bytes, stop = early_stop(content)
+        if read_bytes < len(content):
+            prefix_scores = field_scores(expected, extract(content[:read_bytes], golden['url']))
+            prefix_completeness = sum(prefix_scores.values()) / len(prefix_scores)
+        else:
+            prefix_completeness = completeness
+
+        failures = []
+        if median_ms > limits['max_median_ms'] * args.time_scale:
+            failures.append(f"median {median_ms:.1f}ms > {limits['max_median_ms'] * args.time_scale:.1f}ms")
+        if peak_kb > limits['max_peak_kb']:
+            failures.append(f"peak {peak_kb:.0f}KB > {limits['max_peak_kb']}KB")
+        if completeness < limits['min_completeness']:
+            failures.append(f"completeness {completeness:.3f} < {limits['min_completeness']}")
+        if golden.get('stop') and stop != golden['stop']:
+            failures.append(f"early stop at {stop} != {golden['stop']}")
+        # Ignored when the benchmark is run with non-default extraction options: the scanner
+        # stops at the JSON-LD block that --selectors-first skips
+        if not args.selectors_first and prefix_completeness < completeness:
+            failures.append(f"completeness {prefix_completeness:.3f} after early stop at {read_bytes} bytes")
+        if not args.selectors_first and result.get('extraction_method') != expected.get('extraction_method'):
+            failures.append(f"method {result.get('extraction_method')} != {expected.get('extraction_method')}")
+
+        results.append({
+            'page': name,
+            'bytes': len(content),
+            'stop': stop,
+            'read_bytes': read_bytes,
+            'method': result.get('extraction_method'),
+            'median_ms': round(median_ms, 3),
+            'peak_kb': round(peak_kb, 1),
+            'completeness': round(completeness, 3),
+            'fields': {field: round(score, 3) for field, score in scores.items()},
+            'failures': failures
+        })
+
+    failed = [result for result in results if result['failures']]
+    if args.json:
+        print(json.dumps({'parser': HTML_PARSER, 'partial': not args.no_partial, 'adaptive': args.adaptive,
+                          'results': results, 'failed': len(failed)}, indent=2))
+    else:
+        print_report(results, HTML_PARSER, not args.no_partial, args.adaptive, args.repeat)
+    return 1 if failed else 0
+
+
+def print_report(results, parser, partial, adaptive, repeat):
+    print(f"Extraction benchmark: parser={parser} partial={partial} adaptive={adaptive} repeat={repeat}")
+    print(f"{'page':<44} {'KB':>6} {'stop':<8} {'method':<10} {'median ms':>10} {'peak KB':>9} "
+          f"{'complete':>9}  status")
+    for result in results:
+        status = 'FAIL: ' + '; '.join(result['failures']) if result['failures'] else 'ok'
+        print(f"{result['page']:<44} {result['bytes'] / 1024:>6.1f} {result['stop']:<8} {result['method'] or '-':<10} "
+              f"{result['median_ms']:>10.2f} {result['peak_kb']:>9.0f} {result['completeness']:>9.3f}  {status}")
+        for field, score in result['fields'].items():
+            if score < 1.0:
+                print(f"{'':<46}{field}: {score:.3f}")
+
+    total_ms = sum(result['median_ms'] for result in results)
+    mean_completeness = sum(result['completeness'] for result in results) / len(results)
+    failed = sum(1 for result in results if result['failures'])
+    print(f"\n{len(results)} pages, {total_ms:.1f}ms total median parse time, "
+          f"mean completeness {mean_completeness:.3f}, {failed} failed")
+
+
+def record(url, name):
+    """Save a live page as a new fixture, with the current output as a draft golden to review"""
+    from fetch_client import get_client
+    from recipe_extraction import extract_recipe
+
+    response = get_client().get(url)
+    response.raise_for_status()
+    with open(os.path.join(FIXTURES_DIR, name + '.html'), 'wb') as f:
+        f.write(response.content)
+    golden = {'url': url, 'expected': extract_recipe(response.content, url)}
+    with open(os.path.join(FIXTURES_DIR, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(golden, f, indent=2)
+        f.write('\n')
+    print(f"Recorded {url} as {name}; check {name}.json against the page before committing it")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recipe extraction against recorded pages.')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per page (default 20)')
+    parser.add_argument('--parser', help='BeautifulSoup backend to use instead of HTML_PARSER')
+    parser.add_argument('--no-partial', action='store_true', help='always build the full parse tree')
+    parser.add_argument('--selectors-first', action='store_true', help='skip the JSON-LD fast path')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='learn per-site selector order during warm-up, as the app does')
+    parser.add_argument('--filter', help='only run fixtures whose name contains this')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='multiply the time thresholds, for slower machines')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--record', nargs=2, metavar=('URL', 'NAME'), help='record a live page as a fixture')
+    args = parser.parse_args()
+
+    if args.record:
+        record(*args.record)
+        return 0
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
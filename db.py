@@ -0,0 +1,105 @@
+"""Shared SQLite connections for the app and its background workers.
+
+Opening recipes.db on every request costs a file open, schema parse and
+pragma setup, and throws away the connection's prepared statement cache.
+Database keeps a small pool of open connections per database file
+instead: callers borrow one for the length of a with-block and hand it
+back, so statements prepared by earlier requests are reused (sqlite3
+caches them per connection, keyed by the SQL text).
+
+Connections run in WAL mode, where readers see the last committed
+snapshot and no longer wait for a writer to finish, with
+synchronous=NORMAL (an fsync per checkpoint rather than per commit), a
+larger page cache and memory-mapped reads. Writers still take turns;
+busy_timeout makes them wait for the lock rather than fail.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from queue import Empty, Full, LifoQueue
+
+DEFAULT_DB_PATH = 'recipes.db'
+
+
+def connect(path, cache_size_kb=16384, mmap_size=64 * 1024 * 1024, busy_timeout=5.0, cached_statements=256):
+    """Open a connection to path with the pragmas used throughout the app"""
+    conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False,
+                           cached_statements=cached_statements)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f'PRAGMA cache_size = {-int(cache_size_kb)}')
+    conn.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
+    return conn
+
+
+class Database:
+    def __init__(self, path=DEFAULT_DB_PATH, pool_size=8, **connect_options):
+        self.path = path
+        # Idle connections kept open; more can be borrowed at once, the extras are closed on return
+        self.pool_size = pool_size
+        self.connect_options = connect_options
+        self._idle = LifoQueue(maxsize=pool_size)
+
+    @contextmanager
+    def connection(self):
+        """Borrow an open connection for the with-block
+
+        Anything left uncommitted when the block exits, normally or by an
+        exception, is rolled back before the connection is reused.
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            conn = connect(self.path, **self.connect_options)
+
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (Full, sqlite3.Error):
+            # Pool full, or the connection is no longer usable
+            conn.close()
+
+    def close(self):
+        """Close the idle connections, e.g. at shutdown"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path=DEFAULT_DB_PATH):
+    """Return the process-wide Database for path, creating it from the environment on first use"""
+    database = _databases.get(path)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(path)
+            if database is None:
+                database = _databases[path] = Database(
+                    path,
+                    pool_size=int(os.getenv('SQLITE_POOL_SIZE', '8')),
+                    cache_size_kb=int(float(os.getenv('SQLITE_CACHE_MB', '16')) * 1024),
+                    mmap_size=int(float(os.getenv('SQLITE_MMAP_MB', '64')) * 1024 * 1024),
+                    busy_timeout=float(os.getenv('SQLITE_BUSY_TIMEOUT', '5'))
+                )
+    return database
+
+
+def close_all():
+    with _databases_lock:
+        databases = list(_databases.values())
+    for database in databases:
+        database.close()
@@ -0,0 +1,181 @@
+"""Shared HTTP client for all outbound scraping requests.
+
+One requests.Session is reused for every page and image check so that
+connections stay alive in per-host pools instead of redoing the TCP and
+TLS handshake on each request. Retries with backoff and the default
+browser-like headers are configured here in one place.
+
+Recipe pages are read as a stream: the body is capped at a maximum size
+and a caller-supplied predicate can end the download as soon as the part
+of the page it needs has arrived. Bodies read to the end are cached for
+every reader; a body ended by a predicate with a cache_tag is cached as a
+partial entry that only serves readers stopping on the same tag.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_cache import CachedResponse, HttpCache
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Cache-Control': 'max-age=0'
+}
+
+# Transient statuses worth retrying with backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class FetchClient:
+    def __init__(self, pool_connections=10, pool_maxsize=10, retries=2,
+                 backoff_factor=0.5, timeout=15, headers=None, cache=None, max_body_bytes=None):
+        self.timeout = timeout
+        self.cache = cache
+        # Default cap for streamed bodies; None reads them in full
+        self.max_body_bytes = max_body_bytes
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        # pool_connections is the number of hosts kept pooled,
+        # pool_maxsize the number of keep-alive connections per host
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        return self.session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+
+    def get_streaming(self, url, headers=None, timeout=None, max_bytes=None, stop_when=None):
+        """GET a body incrementally, stopping at max_bytes or once stop_when(body_so_far) is true.
+
+        Returns a CachedResponse whose stop_reason says whether (and why)
+        the body was cut short. The decoded body is what gets counted, so
+        compressed transfers still respect the cap.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_body_bytes
+        response = self.get(url, headers=headers, timeout=timeout, stream=True)
+        body = bytearray()
+        stop_reason = None
+        try:
+            if response.status_code == 200:
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    body += chunk
+                    if max_bytes and len(body) >= max_bytes:
+                        del body[max_bytes:]
+                        stop_reason = 'max_bytes'
+                        break
+                    if stop_when and stop_when(body):
+                        stop_reason = 'early_stop'
+                        break
+            else:
+                body += response.content
+        finally:
+            # Closing before the end drops the connection instead of draining it
+            response.close()
+        return CachedResponse(response.url, response.status_code, bytes(body), response.headers,
+                              from_cache=False, stop_reason=stop_reason)
+
+    def get_cached(self, url, headers=None, timeout=None, max_bytes=None, stop_when=None):
+        """GET through the on-disk cache, revalidating stale entries with a conditional request.
+
+        Network reads are streamed with get_streaming. A body cut short by
+        stop_when is stored as a partial entry if the predicate has a
+        cache_tag attribute, and served back only to reads whose stop_when
+        has the same tag; bodies cut short by max_bytes are never stored.
+        """
+        if self.cache is None:
+            return self.get_streaming(url, headers, timeout, max_bytes, stop_when)
+
+        partial_tag = getattr(stop_when, 'cache_tag', None)
+        entry = self.cache.lookup(url)
+        if entry and not entry.usable_for(partial_tag):
+            # A prefix cut for some other reader: neither its body nor its validators apply
+            entry = None
+        if entry and entry.is_fresh():
+            cached = entry.to_response()
+            if cached is not None:
+                return cached
+            entry = None
+
+        request_headers = dict(headers or {})
+        if entry:
+            request_headers.update(entry.validators())
+        response = self.get_streaming(url, request_headers, timeout, max_bytes, stop_when)
+
+        if response.status_code == 304 and entry:
+            cached = self.cache.revalidated(entry, response.headers).to_response()
+            if cached is not None:
+                return cached
+            # Body went missing underneath us, fetch it unconditionally
+            response = self.get_streaming(url, headers, timeout, max_bytes, stop_when)
+
+        if response.status_code == 200:
+            if response.complete:
+                self.cache.store(url, response)
+            elif response.stop_reason == 'early_stop' and partial_tag:
+                self.cache.store(url, response, partial=partial_tag)
+        return response
+
+    def head(self, url, headers=None, timeout=None, allow_redirects=True, **kwargs):
+        return self.session.head(url, headers=headers, timeout=timeout or self.timeout,
+                                 allow_redirects=allow_redirects, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide FetchClient, creating it from the environment on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cache = None
+                if os.getenv('HTTP_CACHE_ENABLED', '1') == '1':
+                    cache = HttpCache(
+                        directory=os.getenv('HTTP_CACHE_DIR', '.http_cache'),
+                        max_bytes=int(float(os.getenv('HTTP_CACHE_MAX_MB', '256')) * 1024 * 1024),
+                        default_ttl=int(os.getenv('HTTP_CACHE_DEFAULT_TTL', '3600'))
+                    )
+                _client = FetchClient(
+                    pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', '10')),
+                    pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', '10')),
+                    retries=int(os.getenv('HTTP_RETRIES', '2')),
+                    backoff_factor=float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5')),
+                    timeout=float(os.getenv('HTTP_TIMEOUT', '15')),
+                    cache=cache,
+                    max_body_bytes=int(float(os.getenv('HTTP_MAX_BODY_MB', '5')) * 1024 * 1024) or None
+                )
+    return _client
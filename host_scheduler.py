@@ -0,0 +1,110 @@
+"""Per-host politeness scheduler for outbound scraping requests.
+
+Work is run on a bounded thread pool, but each host gets its own
+concurrency cap and a minimum spacing between request starts, so pages
+from different sites are fetched in parallel while any single site only
+sees a polite trickle of requests.
+
+Jobs wait in a queue per host rather than in the pool: a job is handed
+to the pool only once its host has a free concurrency slot and its next
+rate slot has arrived, so pool threads are never parked waiting on a busy
+host while jobs for idle hosts are ready to run.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class _HostState:
+    def __init__(self, requests_per_second, max_concurrency):
+        self.set_limits(requests_per_second, max_concurrency)
+        self.queue = deque()  # (future, fn, args, kwargs) waiting for a slot
+        self.active = 0
+        self.next_slot = 0.0
+        # Wakes the queue up when the next rate slot arrives
+        self.timer = None
+
+    def set_limits(self, requests_per_second, max_concurrency):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0
+        self.max_concurrency = max_concurrency
+
+
+class HostScheduler:
+    def __init__(self, max_workers=8, requests_per_second=2.0, max_per_host=2):
+        self.requests_per_second = requests_per_second
+        self.max_per_host = max_per_host
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='host-fetch')
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._overrides = {}
+
+    def set_host_limits(self, host, requests_per_second=None, max_concurrency=None):
+        """Override the rate and concurrency cap for a single host"""
+        host = host.lower()
+        with self._lock:
+            limits = self._overrides[host] = (
+                requests_per_second if requests_per_second is not None else self.requests_per_second,
+                max_concurrency if max_concurrency is not None else self.max_per_host
+            )
+            state = self._hosts.get(host)
+            if state is not None:
+                state.set_limits(*limits)
+                self._dispatch_locked(state)
+
+    def _host_state_locked(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            rps, cap = self._overrides.get(host, (self.requests_per_second, self.max_per_host))
+            state = self._hosts[host] = _HostState(rps, cap)
+        return state
+
+    def _dispatch_locked(self, state):
+        """Hand queued jobs for one host to the pool while its limits allow"""
+        while state.queue and state.active < state.max_concurrency:
+            now = time.monotonic()
+            if state.next_slot > now:
+                if state.timer is None:
+                    state.timer = threading.Timer(state.next_slot - now, self._wake, (state,))
+                    state.timer.daemon = True
+                    state.timer.start()
+                return
+            future, fn, args, kwargs = state.queue.popleft()
+            # Cancelled while queued: skip it without using up a rate slot
+            if not future.set_running_or_notify_cancel():
+                continue
+            state.active += 1
+            state.next_slot = now + state.interval
+            self.executor.submit(self._run, state, future, fn, args, kwargs)
+
+    def _wake(self, state):
+        with self._lock:
+            state.timer = None
+            self._dispatch_locked(state)
+
+    def _run(self, state, future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                state.active -= 1
+                self._dispatch_locked(state)
+
+    def submit(self, url, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) as a request against url's host
+
+        Returns a Future; cancelling it before the job leaves the host's
+        queue keeps it from ever running.
+        """
+        host = urlparse(url).netloc.lower()
+        future = Future()
+        with self._lock:
+            state = self._host_state_locked(host)
+            state.queue.append((future, fn, args, kwargs))
+            self._dispatch_locked(state)
+        return future
@@ -0,0 +1,231 @@
+"""Persistent on-disk HTTP cache for recipe pages.
+
+Each URL is stored as two files named after the SHA-256 of the URL: a small
+JSON metadata file (status, validators, freshness) and the zlib-compressed
+body. Entries are revalidated with conditional GETs using ETag and
+Last-Modified, and the cache is kept under a byte budget by evicting the
+least recently used entries.
+
+A body whose download was ended early by a stop predicate can be stored
+as a partial entry tagged with that predicate; it is only served to, and
+revalidated for, later reads that would stop at the same point.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+from requests.structures import CaseInsensitiveDict
+
+# Response headers worth keeping alongside the cached body
+STORED_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'expires', 'date')
+
+MAX_AGE_RE = re.compile(r'(?:s-maxage|max-age)\s*=\s*(\d+)', re.IGNORECASE)
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the cache or a streamed read"""
+
+    def __init__(self, url, status_code, content, headers, from_cache=True, stop_reason=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers)
+        self.from_cache = from_cache
+        # 'early_stop' or 'max_bytes' when a streamed body was not read to the end
+        self.stop_reason = stop_reason
+
+    @property
+    def complete(self):
+        return self.stop_reason is None
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+
+class CacheEntry:
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+
+    def is_fresh(self):
+        return time.time() < self.meta.get('expires_at', 0)
+
+    @property
+    def partial(self):
+        """Cache tag of the stop predicate that cut the stored body short, or None if it is whole"""
+        return self.meta.get('partial')
+
+    def usable_for(self, partial_tag):
+        """Whether this entry can answer a read that stops early with partial_tag (None reads it all)"""
+        return self.partial is None or self.partial == partial_tag
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry"""
+        headers = {}
+        if self.meta['headers'].get('etag'):
+            headers['If-None-Match'] = self.meta['headers']['etag']
+        if self.meta['headers'].get('last-modified'):
+            headers['If-Modified-Since'] = self.meta['headers']['last-modified']
+        return headers
+
+    def to_response(self):
+        content = self.cache.read_body(self.key)
+        if content is None:
+            return None
+        return CachedResponse(self.meta['url'], self.meta['status'], content, self.meta['headers'],
+                              stop_reason='early_stop' if self.partial else None)
+
+
+class HttpCache:
+    def __init__(self, directory='.http_cache', max_bytes=256 * 1024 * 1024, default_ttl=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # key -> [last access time, bytes on disk], used for LRU eviction
+        self._entries = {}
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-5]
+            size = 0
+            atime = 0
+            for path in (self._meta_path(key), self._body_path(key)):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                size += stat.st_size
+                atime = max(atime, stat.st_mtime)
+            self._entries[key] = [atime, size]
+            self._total_bytes += size
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key + '.zz')
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _freshness_lifetime(self, headers):
+        cache_control = headers.get('cache-control', '')
+        if 'no-cache' in cache_control.lower():
+            return 0
+        match = MAX_AGE_RE.search(cache_control)
+        if match:
+            return int(match.group(1))
+        return self.default_ttl
+
+    def lookup(self, url):
+        """Return the CacheEntry for url, or None if it is not cached"""
+        key = self.key_for(url)
+        try:
+            with open(self._meta_path(key), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        self._touch(key)
+        return CacheEntry(self, key, meta)
+
+    def read_body(self, key):
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def store(self, url, response, partial=None):
+        """Store a 200 response; returns the new CacheEntry or None if not cacheable
+
+        partial is the cache tag of the stop predicate the body was cut
+        short by, for bodies that were not read to the end.
+        """
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        if 'no-store' in headers.get('cache-control', '').lower():
+            return None
+
+        key = self.key_for(url)
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'headers': headers,
+            'stored_at': time.time(),
+            'expires_at': time.time() + self._freshness_lifetime(headers),
+            'partial': partial
+        }
+        body = zlib.compress(response.content, 6)
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        self._write_atomic(self._body_path(key), body)
+        self._write_atomic(self._meta_path(key), meta_bytes)
+        self._account(key, len(body) + len(meta_bytes))
+        return CacheEntry(self, key, meta)
+
+    def revalidated(self, entry, response_headers):
+        """Refresh an entry after a 304 Not Modified"""
+        for name in STORED_HEADERS:
+            if name in response_headers:
+                entry.meta['headers'][name] = response_headers[name]
+        entry.meta['expires_at'] = time.time() + self._freshness_lifetime(entry.meta['headers'])
+        meta_bytes = json.dumps(entry.meta).encode('utf-8')
+        self._write_atomic(self._meta_path(entry.key), meta_bytes)
+        return entry
+
+    def _touch(self, key):
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._entries[key][0] = now
+        try:
+            os.utime(self._meta_path(key), (now, now))
+        except OSError:
+            pass
+
+    def _account(self, key, size):
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous:
+                self._total_bytes -= previous[1]
+            self._entries[key] = [time.time(), size]
+            self._total_bytes += size
+            if self._total_bytes <= self.max_bytes:
+                return
+            # Evict least recently used entries until we are back under budget
+            victims = sorted(self._entries.items(), key=lambda item: item[1][0])
+            for victim_key, (_, victim_size) in victims:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if victim_key == key:
+                    continue
+                del self._entries[victim_key]
+                self._total_bytes -= victim_size
+                for path in (self._meta_path(victim_key), self._body_path(victim_key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes, 'max_bytes': self.max_bytes}
@@ -0,0 +1,96 @@
+"""Concurrent, cached image URL validation.
+
+Checking that a recipe image is reachable costs a HEAD request, and many
+recipes share CDN images. ImageValidator runs the checks on a small
+thread pool, coalesces concurrent checks of the same URL, and remembers
+both positive and negative results for a TTL so each image is checked at
+most once per TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+
+class ImageValidator:
+    def __init__(self, check, max_workers=8, positive_ttl=86400, negative_ttl=600, max_entries=10000):
+        # check(url) -> bool performs the actual network test
+        self.check = check
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-check')
+        self._lock = threading.Lock()
+        self._results = OrderedDict()  # url -> (ok, expires_at)
+        self._inflight = {}  # url -> Future
+
+    def _cached_locked(self, url):
+        entry = self._results.get(url)
+        if entry is None:
+            return None
+        ok, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._results[url]
+            return None
+        self._results.move_to_end(url)
+        return ok
+
+    def cached(self, url):
+        """Return the cached result for url, or None if unknown or expired"""
+        with self._lock:
+            return self._cached_locked(url)
+
+    def _remember(self, url, ok):
+        ttl = self.positive_ttl if ok else self.negative_ttl
+        with self._lock:
+            self._results[url] = (ok, time.monotonic() + ttl)
+            self._results.move_to_end(url)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            self._inflight.pop(url, None)
+
+    def _run_check(self, url):
+        try:
+            ok = bool(self.check(url))
+        except Exception as e:
+            print(f"Error validating image {url}: {e}")
+            ok = False
+        self._remember(url, ok)
+        return ok
+
+    def submit(self, url):
+        """Start (or join) a check of url and return a Future resolving to a bool"""
+        with self._lock:
+            ok = self._cached_locked(url)
+            if ok is not None:
+                future = Future()
+                future.set_result(ok)
+                return future
+            future = self._inflight.get(url)
+            if future is None:
+                future = self.executor.submit(self._run_check, url)
+                self._inflight[url] = future
+            return future
+
+    def validate(self, url, timeout=None):
+        """Check a single URL, using the cache when possible"""
+        try:
+            return self.submit(url).result(timeout=timeout)
+        except Exception:
+            return False
+
+    def validate_many(self, urls, timeout=None):
+        """Check many URLs concurrently; URLs not resolved within timeout count as invalid"""
+        futures = {url: self.submit(url) for url in set(urls)}
+        wait(futures.values(), timeout=timeout)
+        return {url: future.done() and future.result() for url, future in futures.items()}
+
+    def stats(self):
+        with self._lock:
+            cached = list(self._results.values())
+            return {
+                'entries': len(cached),
+                'valid': sum(1 for ok, _ in cached if ok),
+                'invalid': sum(1 for ok, _ in cached if not ok),
+                'in_flight': len(self._inflight)
+            }
@@ -0,0 +1,400 @@
+"""Bulk-load recipes from archived pages without touching the live sites.
+
+Walks directories of saved HTML pages and WARC files (.warc or
+.warc.gz), extracts recipes on a process pool with the same extraction
+the scraper uses, and upserts them into the recipes table in large
+batched transactions.
+
+Progress is recorded per input file in the ingest_progress table, in the
+same transaction as the recipes it covers, so an interrupted run picks
+up where it stopped: finished files are skipped and a partly read WARC
+file resumes after its last stored record.
+
+Usage:
+    python ingest_archive.py PATH [PATH ...] [--db recipes.db] [--workers N] [--batch-size 1000]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import db
+from ingredient_parser import save_recipe_ingredients
+from recipe_extraction import extract_recipe, get_fallback_image_url, validate_and_optimize_image_url
+from schema import RECIPE_UPSERT_SQL
+
+HTML_EXTENSIONS = ('.html', '.htm')
+WARC_EXTENSIONS = ('.warc', '.warc.gz')
+
+# Where a saved page records the address it came from, most reliable first
+PAGE_URL_RES = [
+    re.compile(rb'<link[^>]+rel=["\']canonical["\'][^>]+href=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(rb'<link[^>]+href=["\']([^"\']+)["\'][^>]+rel=["\']canonical["\']', re.IGNORECASE),
+    re.compile(rb'<meta[^>]+property=["\']og:url["\'][^>]+content=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(rb'<!-- saved from url=\(\d+\)(\S+) -->', re.IGNORECASE)
+]
+
+
+def page_url(content, path):
+    """The page's original URL, or a file:// URL when the saved page does not say"""
+    head = content[:65536]
+    for pattern in PAGE_URL_RES:
+        match = pattern.search(head)
+        if match and match.group(1).startswith((b'http://', b'https://')):
+            return match.group(1).decode('utf-8', errors='replace')
+    return 'file://' + os.path.abspath(path)
+
+
+def iter_warc_records(path):
+    """Yield (headers, block) for each record of a WARC file, gzipped or not"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue  # blank lines between records
+            if not line.startswith(b'WARC/'):
+                raise ValueError(f"{path}: expected a WARC record header, got {line[:40]!r}")
+            headers = {}
+            for line in iter(f.readline, b''):
+                if not line.strip():
+                    break
+                name, _, value = line.decode('utf-8', errors='replace').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            yield headers, f.read(int(headers.get('content-length', 0)))
+
+
+def decode_chunked(body):
+    decoded = bytearray()
+    while body:
+        size_line, _, rest = body.partition(b'\r\n')
+        size = int(size_line.split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        decoded += rest[:size]
+        body = rest[size + 2:]
+    return bytes(decoded)
+
+
+def http_response_body(block):
+    """Return the HTML body of an archived HTTP response, or None if it is not a 200 HTML page"""
+    head, _, body = block.partition(b'\r\n\r\n')
+    lines = head.decode('iso-8859-1').split('\r\n')
+    status = lines[0].split()
+    if len(status) < 2 or status[1] != '200':
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if 'html' not in headers.get('content-type', 'text/html'):
+        return None
+    if 'chunked' in headers.get('transfer-encoding', ''):
+        body = decode_chunked(body)
+    encoding = headers.get('content-encoding', '')
+    if encoding in ('gzip', 'x-gzip'):
+        body = gzip.decompress(body)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+    return body
+
+
+def iter_warc_pages(path):
+    """Yield (url, html) for every archived HTML page in a WARC file"""
+    for headers, block in iter_warc_records(path):
+        record_type = headers.get('warc-type')
+        url = headers.get('warc-target-uri', '').strip('<>')
+        if record_type == 'response' and 'application/http' in headers.get('content-type', ''):
+            body = http_response_body(block)
+        elif record_type == 'resource' and 'html' in headers.get('content-type', ''):
+            body = block
+        else:
+            continue
+        if body and url:
+            yield url, body
+
+
+def find_inputs(paths):
+    """Expand the given files and directories into sorted HTML and WARC files"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if name.lower().endswith(HTML_EXTENSIONS + WARC_EXTENSIONS):
+                        found.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            print(f"Skipping {path}: no such file or directory")
+    return sorted(set(found))
+
+
+def recipe_from_page(content, url):
+    """Offline equivalent of app.get_recipe_details for one archived page"""
+    details = extract_recipe(content, url)
+    if len(details['ingredients']) < 2 or len(details['instructions']) < 1:
+        return None
+    title = details['title'] or 'Unknown Recipe'
+    # No network here, so only missing images get the fallback
+    image_url = validate_and_optimize_image_url(details['image_url']) or \
+        get_fallback_image_url(title, details['ingredients'])
+    return {
+        'title': title,
+        'ingredients': details['ingredients'],
+        'instructions': details['instructions'],
+        'image_url': image_url,
+        'source_url': url,
+        'recipe_yield': details['recipe_yield'],
+        'nutrition_info': details['nutrition']
+    }
+
+
+def extract_batch(pages):
+    """Worker: extract a batch of (source, index, url, html) pages"""
+    results = []
+    for source, index, url, content in pages:
+        try:
+            recipe = recipe_from_page(content, url)
+            error = None
+        except Exception as e:
+            recipe, error = None, str(e)
+        results.append((source, index, recipe, error))
+    return results
+
+
+class Ingester:
+    def __init__(self, db_path, workers=None, batch_size=1000, pages_per_task=32, restart=False):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.pages_per_task = pages_per_task
+        # Bulk load: the app's WAL settings with a bigger page cache
+        self.conn = db.connect(db_path, cache_size_kb=65536)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_progress (
+                source TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                records_done INTEGER NOT NULL DEFAULT 0,
+                recipes INTEGER NOT NULL DEFAULT 0,
+                completed_at TIMESTAMP
+            )
+        ''')
+        if restart:
+            self.conn.execute('DELETE FROM ingest_progress')
+        self.conn.commit()
+
+        self.pending_recipes = []
+        self.pending_progress = {}  # source -> (records_done, recipes found, completed)
+        self.counts = {'files': 0, 'skipped_files': 0, 'pages': 0, 'recipes': 0, 'no_recipe': 0, 'errors': 0}
+        self.started = time.monotonic()
+        self.last_report = 0
+
+    def progress_for(self, source, size, mtime):
+        """(records_done, recipes, completed) recorded for source, reset if the file has changed"""
+        row = self.conn.execute(
+            'SELECT size, mtime, records_done, recipes, completed_at FROM ingest_progress WHERE source = ?',
+            (source,)
+        ).fetchone()
+        if not row or row[0] != size or row[1] != mtime:
+            self.conn.execute('''
+                INSERT INTO ingest_progress (source, size, mtime) VALUES (?, ?, ?)
+                ON CONFLICT (source) DO UPDATE SET
+                    size = excluded.size, mtime = excluded.mtime,
+                    records_done = 0, recipes = 0, completed_at = NULL
+            ''', (source, size, mtime))
+            self.conn.commit()
+            return 0, 0, False
+        return row[2], row[3], row[4] is not None
+
+    def iter_work(self, inputs):
+        """Yield ('page', source, index, url, html) and ('end', source, pages) items to process"""
+        for path in inputs:
+            source = os.path.abspath(path)
+            stat = os.stat(path)
+            records_done, _, completed = self.progress_for(source, stat.st_size, stat.st_mtime)
+            if completed:
+                self.counts['skipped_files'] += 1
+                continue
+            self.counts['files'] += 1
+
+            if path.lower().endswith(WARC_EXTENSIONS):
+                try:
+                    pages = iter_warc_pages(path)
+                    index = 0
+                    for index, (url, content) in enumerate(pages, 1):
+                        if index > records_done:
+                            yield ('page', source, index, url, content)
+                except (OSError, ValueError, EOFError) as e:
+                    print(f"Error reading {path}: {e}")
+                    self.counts['errors'] += 1
+                yield ('end', source, index)
+            else:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                yield ('page', source, 1, page_url(content, path), content)
+                yield ('end', source, 1)
+
+    def iter_tasks(self, inputs):
+        """Group pages into worker tasks; 'end' markers close the current task first"""
+        batch = []
+        for item in self.iter_work(inputs):
+            if item[0] == 'page':
+                batch.append(item[1:])
+                if len(batch) >= self.pages_per_task:
+                    yield 'pages', batch
+                    batch = []
+            else:
+                if batch:
+                    yield 'pages', batch
+                    batch = []
+                yield 'end', item[1:]
+        if batch:
+            yield 'pages', batch
+
+    def handle_results(self, results):
+        for source, index, recipe, error in results:
+            self.counts['pages'] += 1
+            records_done, found, _ = self.pending_progress.get(source, (0, 0, False))
+            if error:
+                self.counts['errors'] += 1
+            elif recipe:
+                self.pending_recipes.append(recipe)
+                found += 1
+            else:
+                self.counts['no_recipe'] += 1
+            self.pending_progress[source] = (max(records_done, index), found, False)
+        self.maybe_flush()
+
+    def handle_end(self, source, pages):
+        records_done, found, _ = self.pending_progress.get(source, (pages, 0, False))
+        self.pending_progress[source] = (max(records_done, pages), found, True)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if len(self.pending_recipes) >= self.batch_size or len(self.pending_progress) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write pending recipes and the progress they complete in one transaction"""
+        if not self.pending_recipes and not self.pending_progress:
+            return
+        with self.conn:
+            self.conn.executemany(RECIPE_UPSERT_SQL, [(
+                recipe['title'],
+                json.dumps(recipe['ingredients']),
+                json.dumps(recipe['instructions']),
+                json.dumps(recipe['nutrition_info']) if recipe['nutrition_info'] else None,
+                recipe['image_url'],
+                recipe['source_url'],
+                recipe['recipe_yield']
+            ) for recipe in self.pending_recipes])
+            self.save_ingredients()
+            self.conn.executemany('''
+                UPDATE ingest_progress SET
+                    records_done = MAX(records_done, ?),
+                    recipes = recipes + ?,
+                    completed_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE completed_at END
+                WHERE source = ?
+            ''', [(records_done, found, completed, source)
+                  for source, (records_done, found, completed) in self.pending_progress.items()])
+        self.counts['recipes'] += len(self.pending_recipes)
+        self.pending_recipes = []
+        self.pending_progress = {}
+        self.report()
+
+    def save_ingredients(self):
+        """Parse the pending recipes' ingredients into recipe_ingredients, by their stored ids"""
+        ids_by_url = {}
+        urls = list({recipe['source_url'] for recipe in self.pending_recipes})
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            ids_by_url.update(self.conn.execute(
+                f'SELECT source_url, id FROM recipes WHERE source_url IN ({placeholders})', chunk
+            ).fetchall())
+        save_recipe_ingredients(self.conn.cursor(), [(ids_by_url[recipe['source_url']], recipe['ingredients'])
+                                                     for recipe in self.pending_recipes])
+
+    def report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self.last_report < 5:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = self.counts['pages'] / elapsed if elapsed else 0
+        print(f"{'Done' if final else 'Progress'}: {self.counts['files']} files "
+              f"({self.counts['skipped_files']} already done), {self.counts['pages']} pages, "
+              f"{self.counts['recipes']} recipes stored, {self.counts['no_recipe']} without a recipe, "
+              f"{self.counts['errors']} errors, {rate:.0f} pages/s, {elapsed:.0f}s elapsed", flush=True)
+
+    def run(self, inputs):
+        # Bounded in-flight window keeps memory flat on huge archives, and
+        # consuming results in order keeps the progress records exact
+        window = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for kind, payload in self.iter_tasks(inputs):
+                if kind == 'pages':
+                    window.append(('pages', executor.submit(extract_batch, payload)))
+                else:
+                    window.append(('end', payload))
+                while len(window) > self.workers * 4:
+                    self.consume(window.popleft())
+            while window:
+                self.consume(window.popleft())
+        self.flush()
+        self.report(final=True)
+        return self.counts
+
+    def consume(self, entry):
+        kind, payload = entry
+        if kind == 'pages':
+            self.handle_results(payload.result())
+        else:
+            self.handle_end(*payload)
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-load recipes from saved HTML pages and WARC files.')
+    parser.add_argument('paths', nargs='+', help='HTML/WARC files or directories to scan')
+    parser.add_argument('--db', default='recipes.db', help='SQLite database (default recipes.db)')
+    parser.add_argument('--workers', type=int, default=None, help='extraction processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='recipes per write transaction')
+    parser.add_argument('--restart', action='store_true', help='forget previous progress and re-ingest everything')
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.paths)
+    if not inputs:
+        print('No HTML or WARC files found')
+        return 1
+    print(f"Ingesting {len(inputs)} files into {args.db}")
+
+    ingester = Ingester(args.db, workers=args.workers, batch_size=args.batch_size, restart=args.restart)
+    try:
+        ingester.run(inputs)
+    except KeyboardInterrupt:
+        print('Interrupted; progress so far is saved, run again to resume')
+        return 130
+    except sqlite3.OperationalError as e:
+        print(f"Database error: {e} (create the tables with reset_db.py or by starting the app first)")
+        return 1
+    finally:
+        ingester.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Split free-text ingredient lines into quantity, unit and ingredient name.
+
+Scraped recipes store their ingredients as the lines the site printed
+("1 1/2 cups all-purpose flour, sifted"). parse_ingredient pulls out the
+leading amount (whole numbers, decimals, fractions, unicode fractions and
+ranges), a canonical unit and a normalized name ("all-purpose flour") so
+the recipe_ingredients table can be queried by ingredient. normalize_name
+is also what pantry ingredients are matched with, so both sides agree.
+
+Parsing is deliberately forgiving: anything it cannot make sense of ends
+up in the name, and raw_text always keeps the original line.
+"""
+import re
+from fractions import Fraction
+from functools import lru_cache
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5', '⅖': '2/5',
+    '⅗': '3/5', '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8'
+}
+# "1½" -> "1 1/2", "½" -> "1/2"
+UNICODE_FRACTION_RE = re.compile(r'(\d?)([' + ''.join(UNICODE_FRACTIONS) + '])')
+
+# Spelling variants -> canonical unit
+UNIT_ALIASES = {
+    'cup': ['cup', 'cups', 'c'],
+    'tbsp': ['tablespoon', 'tablespoons', 'tbsp', 'tbsps', 'tbs', 'tbl', 'T'],
+    'tsp': ['teaspoon', 'teaspoons', 'tsp', 'tsps', 't'],
+    'oz': ['ounce', 'ounces', 'oz'],
+    'fl oz': ['fluid ounce', 'fluid ounces', 'fl oz', 'fl. oz'],
+    'lb': ['pound', 'pounds', 'lb', 'lbs'],
+    'g': ['gram', 'grams', 'g', 'gr'],
+    'kg': ['kilogram', 'kilograms', 'kg', 'kgs'],
+    'ml': ['milliliter', 'milliliters', 'millilitre', 'millilitres', 'ml'],
+    'l': ['liter', 'liters', 'litre', 'litres', 'l'],
+    'pint': ['pint', 'pints', 'pt'],
+    'quart': ['quart', 'quarts', 'qt'],
+    'gallon': ['gallon', 'gallons', 'gal'],
+    'pinch': ['pinch', 'pinches'],
+    'dash': ['dash', 'dashes'],
+    'clove': ['clove', 'cloves'],
+    'can': ['can', 'cans', 'tin', 'tins'],
+    'package': ['package', 'packages', 'pkg', 'packet', 'packets'],
+    'jar': ['jar', 'jars'],
+    'bottle': ['bottle', 'bottles'],
+    'stick': ['stick', 'sticks'],
+    'slice': ['slice', 'slices'],
+    'piece': ['piece', 'pieces'],
+    'bunch': ['bunch', 'bunches'],
+    'sprig': ['sprig', 'sprigs'],
+    'head': ['head', 'heads'],
+    'handful': ['handful', 'handfuls']
+}
+# Single-letter units are only trusted with the capitalization cooks use for them ("1 T", "1 t")
+CASE_SENSITIVE_UNITS = {'T': 'tbsp', 't': 'tsp'}
+UNITS = {alias.lower(): unit for unit, aliases in UNIT_ALIASES.items()
+         for alias in aliases if alias not in CASE_SENSITIVE_UNITS}
+UNIT_RE = re.compile(
+    r'(' + '|'.join(sorted((re.escape(alias) for alias in UNITS), key=len, reverse=True)) + r')\.?(?=\s|$)',
+    re.IGNORECASE
+)
+
+# Some sites' markup runs amount, unit and name together ("2cupsheavy cream"); only spelled-out
+# units right after the number are split off, since abbreviations would eat real words
+GLUED_UNIT_RE = re.compile(r'(tablespoon|teaspoon|cup|ounce|pound)(s?)(?=[a-z])', re.IGNORECASE)
+
+# Mixed numbers ('1 1/2', '1-1/2') and fractions first, so '1/2' is not read as 1
+NUMBER = r'\d+[\s-]+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|\.\d+'
+QUANTITY_RE = re.compile(rf'^\s*({NUMBER})(?:\s*(?:-|–|to)\s*({NUMBER}))?\s*')
+# "a pinch of salt", "an onion"
+ARTICLE_RE = re.compile(r'^(?:a|an)\s+', re.IGNORECASE)
+LEADING_OF_RE = re.compile(r'^\s*of\s+', re.IGNORECASE)
+# "(15 ounce)", "[optional]"
+PARENTHETICAL_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+
+# Preparation and size words that say how much or how, not what
+DESCRIPTORS = {
+    'chopped', 'finely', 'roughly', 'coarsely', 'thinly', 'thickly', 'diced', 'minced', 'sliced', 'grated',
+    'shredded', 'crushed', 'ground', 'peeled', 'cubed', 'halved', 'quartered', 'trimmed', 'rinsed', 'drained',
+    'softened', 'melted', 'beaten', 'divided', 'packed', 'sifted', 'toasted', 'cooked', 'uncooked', 'fresh',
+    'freshly', 'dried', 'frozen', 'thawed', 'large', 'medium', 'small', 'extra', 'about', 'approximately',
+    'optional', 'to', 'taste', 'plus', 'more', 'for', 'serving', 'garnish', 'room', 'temperature', 'lightly',
+    'heaping', 'level', 'scant', 'whole', 'boneless', 'skinless'
+}
+NAME_WORD_RE = re.compile(r"[a-z][a-z'\-]*")
+# Plurals whose singular ends in -f or -fe; other -ves words (olives, chives, cloves) just drop the s
+VES_SINGULARS = {
+    'leaves': 'leaf', 'halves': 'half', 'loaves': 'loaf', 'calves': 'calf', 'knives': 'knife'
+}
+
+
+def parse_number(text):
+    """'1 1/2' -> 1.5, '1-1/2' -> 1.5, '.5' -> 0.5; None if text is not a number"""
+    try:
+        if '/' not in text:
+            return float(text)
+        return float(sum(Fraction(part) for part in text.replace('-', ' ').split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def singularize(word):
+    """'cherries' -> 'cherry', 'tomatoes' -> 'tomato', 'leaves' -> 'leaf', 'olives' -> 'olive'"""
+    if word in VES_SINGULARS:
+        return VES_SINGULARS[word]
+    if len(word) <= 3 or word.endswith('ss') or word.endswith('us'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes') or word.endswith('ches') or word.endswith('shes'):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_name(text):
+    """Canonical ingredient name: lower case, no prep or size words, singular last word"""
+    text = PARENTHETICAL_RE.sub(' ', (text or '').lower())
+    # What follows a comma is preparation ("onion, finely chopped")
+    text = text.split(',')[0]
+    words = [word.strip("'-") for word in NAME_WORD_RE.findall(text)]
+    words = [word for word in words if word and word not in DESCRIPTORS]
+    # "pepper, or to taste" leaves a dangling conjunction
+    while words and words[-1] in ('and', 'or'):
+        words.pop()
+    if not words:
+        return ''
+    words[-1] = singularize(words[-1])
+    return ' '.join(words)
+
+
+def parse_ingredient(text):
+    """Parse one ingredient line into {'raw_text', 'quantity', 'unit', 'name'}"""
+    raw_text = ' '.join((text or '').split())
+    quantity, unit, name = parse_line(raw_text)
+    return {'raw_text': raw_text, 'quantity': quantity, 'unit': unit, 'name': name}
+
+
+# The same lines ("1 teaspoon salt") come up over and over in a bulk save
+@lru_cache(maxsize=65536)
+def parse_line(raw_text):
+    """(quantity, unit, name) of a whitespace-normalized ingredient line"""
+    rest = raw_text
+    if not rest.isascii():
+        rest = UNICODE_FRACTION_RE.sub(
+            lambda match: (match.group(1) + ' ' if match.group(1) else '') + UNICODE_FRACTIONS[match.group(2)], rest
+        ).replace('⁄', '/')
+
+    quantity = None
+    glued = False
+    match = QUANTITY_RE.match(rest)
+    if match:
+        glued = not match.group(0)[-1].isspace()
+        # Ranges ("2-3 cloves") keep their lower bound
+        quantity = parse_number(match.group(1))
+        rest = rest[match.end():]
+    else:
+        article = ARTICLE_RE.match(rest)
+        if article:
+            quantity = 1.0
+            rest = rest[article.end():]
+
+    # Package sizes like "1 (15 ounce) can" say nothing about how many
+    rest = PARENTHETICAL_RE.sub(' ', rest).strip()
+
+    unit = None
+    first = rest.split(' ', 1)[0].rstrip('.')
+    if first in CASE_SENSITIVE_UNITS:
+        unit = CASE_SENSITIVE_UNITS[first]
+        rest = rest[len(first):].lstrip('. ')
+    else:
+        match = UNIT_RE.match(rest)
+        glued_match = glued and not match and GLUED_UNIT_RE.match(rest)
+        if match:
+            unit = UNITS[match.group(1).lower()]
+            rest = rest[match.end():]
+        elif glued_match:
+            unit = UNITS[glued_match.group(1).lower()]
+            # "1teaspoonsalt": a single unit is singular, so the s belongs to the name
+            plural = glued_match.group(2) and (quantity is None or quantity > 1)
+            rest = rest[glued_match.end(2 if plural else 1):]
+    rest = LEADING_OF_RE.sub('', rest)
+
+    return quantity, unit, normalize_name(rest)
+
+
+def save_recipe_ingredients(cursor, recipes):
+    """Replace the recipe_ingredients rows of each (recipe_id, ingredient lines) pair in recipes"""
+    # The same recipe twice in one batch (an upsert) keeps its last ingredient list
+    recipes = list(dict(recipes).items())
+    cursor.executemany('DELETE FROM recipe_ingredients WHERE recipe_id = ?',
+                       [(recipe_id,) for recipe_id, _ in recipes])
+    rows = []
+    for recipe_id, ingredients in recipes:
+        for position, line in enumerate(ingredients or []):
+            if not isinstance(line, str) or not line.strip():
+                continue
+            parsed = parse_ingredient(line)
+            rows.append((recipe_id, position, parsed['raw_text'], parsed['name'] or None,
+                         parsed['quantity'], parsed['unit']))
+    cursor.executemany('''
+        INSERT INTO recipe_ingredients (recipe_id, position, raw_text, name, quantity, unit)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
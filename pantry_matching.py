@@ -0,0 +1,168 @@
+"""Rank stored recipes by how much of them the pantry already covers.
+
+PantryIndex keeps an in-memory inverted index built from the
+recipe_ingredients table: each normalized ingredient name maps to the
+recipes that use it, and every word-suffix of a name ("olive oil" and
+"oil" for "extra-virgin olive oil") maps to the full names it ends, so
+a pantry entry covers the more specific ingredients it names. Matching a
+pantry only walks the posting lists of its own ingredients, counts the
+covered ingredients per recipe and keeps the best ones with a heap, so
+its cost grows with how many recipes share the pantry's ingredients
+rather than with the size of the table.
+
+The index is refreshed incrementally before each ranking: the app marks
+the recipes it saves as changed, and recipe_ingredients rows past the
+highest rowid seen pick up recipes written by other processes (the
+ingest CLI). A full rebuild every rebuild_interval seconds catches
+anything else, such as deleted recipes.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+
+from db import get_database
+from ingredient_parser import normalize_name
+
+
+def name_suffixes(name):
+    """'extra-virgin olive oil' -> ['extra-virgin olive oil', 'olive oil', 'oil']"""
+    words = name.split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PantryIndex:
+    def __init__(self, db_path='recipes.db', rebuild_interval=3600):
+        self.db_path = db_path
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._postings = {}     # ingredient name -> set of recipe ids
+        self._recipe_names = {}  # recipe id -> frozenset of its ingredient names
+        self._totals = {}       # recipe id -> number of distinct ingredient names
+        self._suffixes = {}     # name suffix -> set of full ingredient names ending with it
+        self._max_rowid = 0
+        self._built_at = None
+        self._changed = set()
+
+    def _add(self, recipe_id, names):
+        self._recipe_names[recipe_id] = names
+        self._totals[recipe_id] = len(names)
+        for name in names:
+            postings = self._postings.get(name)
+            if postings is None:
+                postings = self._postings[name] = set()
+                for suffix in name_suffixes(name):
+                    self._suffixes.setdefault(suffix, set()).add(name)
+            postings.add(recipe_id)
+
+    def _remove(self, recipe_id):
+        # Names left without recipes stay in the vocabulary until the next full rebuild
+        self._totals.pop(recipe_id, None)
+        for name in self._recipe_names.pop(recipe_id, ()):
+            self._postings[name].discard(recipe_id)
+
+    def _load(self, conn, recipe_ids=None):
+        """{recipe_id: frozenset(names)} for the given recipes, or for all of them"""
+        if recipe_ids is None:
+            rows = conn.execute('SELECT recipe_id, name FROM recipe_ingredients WHERE name IS NOT NULL').fetchall()
+        else:
+            rows = []
+            recipe_ids = list(recipe_ids)
+            for i in range(0, len(recipe_ids), 500):
+                chunk = recipe_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows += conn.execute(f'''
+                    SELECT recipe_id, name FROM recipe_ingredients
+                    WHERE name IS NOT NULL AND recipe_id IN ({placeholders})
+                ''', chunk).fetchall()
+        names = {}
+        for recipe_id, name in rows:
+            names.setdefault(recipe_id, set()).add(name)
+        return {recipe_id: frozenset(recipe_names) for recipe_id, recipe_names in names.items()}
+
+    def mark_changed(self, recipe_ids):
+        """Re-index these recipes on the next refresh"""
+        with self._lock:
+            self._changed.update(recipe_ids)
+
+    def refresh(self):
+        """Bring the index up to date with recipe_ingredients"""
+        with get_database(self.db_path).connection() as conn:
+            max_rowid = conn.execute('SELECT MAX(rowid) FROM recipe_ingredients').fetchone()[0] or 0
+            with self._lock:
+                if self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_interval:
+                    recipes = self._load(conn)
+                    self._postings, self._recipe_names, self._totals, self._suffixes = {}, {}, {}, {}
+                    for recipe_id, names in recipes.items():
+                        self._add(recipe_id, names)
+                    self._built_at = time.monotonic()
+                    self._changed.clear()
+                elif self._changed or max_rowid > self._max_rowid:
+                    changed = self._changed | {row[0] for row in conn.execute(
+                        'SELECT DISTINCT recipe_id FROM recipe_ingredients WHERE rowid > ?', (self._max_rowid,)
+                    )}
+                    self._changed = set()
+                    recipes = self._load(conn, changed)
+                    for recipe_id in changed:
+                        self._remove(recipe_id)
+                        if recipe_id in recipes:
+                            self._add(recipe_id, recipes[recipe_id])
+                self._max_rowid = max_rowid
+
+    def covered_names(self, pantry):
+        """The recipe ingredient names a pantry covers, given its normalized names"""
+        with self._lock:
+            covered = set()
+            for name in pantry:
+                covered |= self._suffixes.get(name, set())
+            return covered
+
+    def rank(self, pantry, count, max_missing=None):
+        """The count best-covered recipes as (recipe_id, covered, total), best first
+
+        Recipes are ordered by the share of their ingredients the pantry
+        covers, then by fewest missing ingredients, then newest first.
+        """
+        self.refresh()
+        covered = self.covered_names(pantry)
+        with self._lock:
+            hits = Counter()
+            for name in covered:
+                hits.update(self._postings.get(name, ()))
+            totals = self._totals
+            candidates = hits
+            if max_missing is not None:
+                candidates = [recipe_id for recipe_id in hits if totals[recipe_id] - hits[recipe_id] <= max_missing]
+            # A key function rather than a list of sort tuples: allocating one tuple per candidate
+            # keeps the garbage collector busy walking the whole index
+            best = heapq.nlargest(count, candidates, key=lambda recipe_id: (
+                hits[recipe_id] / totals[recipe_id], hits[recipe_id] - totals[recipe_id], recipe_id))
+            return [(recipe_id, hits[recipe_id], totals[recipe_id]) for recipe_id in best]
+
+    def stats(self):
+        with self._lock:
+            return {'recipes': len(self._recipe_names), 'ingredients': len(self._postings),
+                    'max_rowid': self._max_rowid}
+
+
+def pantry_names(conn):
+    """Normalized names of everything in user_ingredients"""
+    rows = conn.execute('SELECT ingredient_name FROM user_ingredients').fetchall()
+    return sorted({normalize_name(row[0]) for row in rows} - {''})
+
+
+def missing_ingredients(conn, recipe_ids, covered):
+    """{recipe_id: [ingredient lines the pantry does not cover]}, lines in recipe order"""
+    missing = {recipe_id: [] for recipe_id in recipe_ids}
+    if not recipe_ids:
+        return missing
+    placeholders = ','.join('?' * len(recipe_ids))
+    rows = conn.execute(f'''
+        SELECT recipe_id, raw_text, name FROM recipe_ingredients
+        WHERE recipe_id IN ({placeholders})
+        ORDER BY recipe_id, position
+    ''', list(recipe_ids)).fetchall()
+    for recipe_id, raw_text, name in rows:
+        if name and name not in covered:
+            missing[recipe_id].append(raw_text)
+    return missing
@@ -0,0 +1,197 @@
+"""Background pre-warming of popular searches.
+
+Every interactive search is logged into the crawl_frontier table with a
+popularity score that decays with a configurable half-life, so the
+frontier favours queries that are both popular and recent. A daemon
+thread wakes up periodically, picks the highest scoring entries whose
+results are about to go stale and re-crawls them within a per-cycle
+budget (number of queries and wall time), so interactive searches for
+common terms find warm results in the query cache.
+
+Entries are claimed with a conditional UPDATE before crawling, so
+several worker processes sharing recipes.db never crawl the same query
+in the same cycle.
+"""
+import sqlite3
+import threading
+import time
+
+from db import get_database
+from query_cache import normalize_query
+
+
+class PrewarmCrawler:
+    def __init__(self, db_path, crawl, interval=600, max_queries=5, budget_seconds=120,
+                 recrawl_after=3000, half_life_hours=24, min_score=2.0, max_frontier=500):
+        self.db_path = db_path
+        # crawl(query, max_recipes) -> number of recipes stored
+        self.crawl = crawl
+        self.interval = interval
+        self.max_queries = max_queries
+        self.budget_seconds = budget_seconds
+        # Re-crawl an entry once its last crawl is this old (keep it below the query cache TTL)
+        self.recrawl_after = recrawl_after
+        self.half_life = half_life_hours * 3600
+        # Decayed search count a query needs before it is worth crawling ahead of time
+        self.min_score = min_score
+        self.max_frontier = max_frontier
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.crawled = 0
+        self.last_cycle = None
+
+    def decayed(self, score, scored_at, now):
+        return score * 0.5 ** ((now - scored_at) / self.half_life)
+
+    def log_search(self, query, max_recipes):
+        """Count an interactive search towards its frontier entry"""
+        query_key = normalize_query(query)
+        if not query_key:
+            return
+        # Logging must never fail the search itself
+        try:
+            now = time.time()
+            with get_database(self.db_path).connection() as conn:
+                cursor = conn.cursor()
+                # Take the write lock before reading the score, so concurrent searches
+                # for the same query each add their 1 instead of overwriting each other
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('SELECT score, scored_at FROM crawl_frontier WHERE query_key = ? AND max_recipes = ?',
+                               (query_key, max_recipes))
+                row = cursor.fetchone()
+                score = (self.decayed(row[0], row[1], now) if row else 0) + 1
+                cursor.execute('''
+                    INSERT INTO crawl_frontier (query_key, max_recipes, query, score, scored_at, search_count, last_searched_at)
+                    VALUES (?, ?, ?, ?, ?, 1, ?)
+                    ON CONFLICT (query_key, max_recipes) DO UPDATE SET
+                        query = excluded.query,
+                        score = excluded.score,
+                        scored_at = excluded.scored_at,
+                        search_count = crawl_frontier.search_count + 1,
+                        last_searched_at = excluded.last_searched_at
+                ''', (query_key, max_recipes, query, score, now, now))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error logging search '{query}': {e}")
+
+    def frontier(self, limit=None):
+        """Frontier entries with their current decayed score, most popular first"""
+        now = time.time()
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT query_key, max_recipes, query, score, scored_at, search_count,
+                       last_searched_at, last_crawled_at, last_result_count, last_error
+                FROM crawl_frontier
+            ''')
+            rows = cursor.fetchall()
+
+        entries = []
+        for row in rows:
+            entries.append({
+                'query_key': row[0],
+                'max_recipes': row[1],
+                'query': row[2],
+                'score': round(self.decayed(row[3], row[4], now), 3),
+                'search_count': row[5],
+                'last_searched_at': row[6],
+                'last_crawled_at': row[7],
+                'last_result_count': row[8],
+                'last_error': row[9]
+            })
+        entries.sort(key=lambda entry: entry['score'], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def _claim(self, entry, now):
+        """Mark an entry as being crawled; False if another worker got to it first"""
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE crawl_frontier SET last_crawled_at = ?
+                WHERE query_key = ? AND max_recipes = ?
+                  AND (last_crawled_at IS NULL OR last_crawled_at < ?)
+            ''', (now, entry['query_key'], entry['max_recipes'], now - self.recrawl_after))
+            claimed = cursor.rowcount == 1
+            conn.commit()
+        return claimed
+
+    def _record(self, entry, result_count, error):
+        with get_database(self.db_path).connection() as conn:
+            conn.execute('''
+                UPDATE crawl_frontier SET last_result_count = ?, last_error = ?
+                WHERE query_key = ? AND max_recipes = ?
+            ''', (result_count, error, entry['query_key'], entry['max_recipes']))
+            conn.commit()
+
+    def _prune(self, entries):
+        """Forget entries that have decayed to nothing and any beyond max_frontier"""
+        dropped = entries[self.max_frontier:]
+        dropped += [entry for entry in entries[:self.max_frontier] if entry['score'] < 0.01]
+        if not dropped:
+            return
+        with get_database(self.db_path).connection() as conn:
+            conn.executemany('DELETE FROM crawl_frontier WHERE query_key = ? AND max_recipes = ?',
+                             [(entry['query_key'], entry['max_recipes']) for entry in dropped])
+            conn.commit()
+
+    def run_cycle(self):
+        """Re-crawl the most popular due entries until the cycle budget runs out"""
+        started = time.monotonic()
+        entries = self.frontier()
+        self._prune(entries)
+
+        crawled = []
+        for entry in entries:
+            if len(crawled) >= self.max_queries or time.monotonic() - started >= self.budget_seconds:
+                break
+            if entry['score'] < self.min_score:
+                break  # sorted by score, nothing below is popular enough
+            if not self._claim(entry, time.time()):
+                continue
+
+            result_count, error = None, None
+            try:
+                print(f"Pre-warming '{entry['query']}' (score {entry['score']})")
+                result_count = self.crawl(entry['query'], entry['max_recipes'])
+            except Exception as e:
+                print(f"Pre-warm crawl of '{entry['query']}' failed: {e}")
+                error = str(e)
+            self._record(entry, result_count, error)
+            crawled.append(entry['query'])
+
+        self.cycles += 1
+        self.crawled += len(crawled)
+        self.last_cycle = {
+            'finished_at': time.time(),
+            'elapsed': round(time.monotonic() - started, 3),
+            'crawled': crawled
+        }
+        return crawled
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_cycle()
+            except Exception as e:
+                print(f"Pre-warm cycle failed: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='prewarm-crawler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'cycles': self.cycles,
+            'crawled': self.crawled,
+            'last_cycle': self.last_cycle
+        }
@@ -0,0 +1,144 @@
+"""Query-level scrape result cache with stale-while-revalidate.
+
+Searches are normalized ("Chicken  Recipes" == "chicken recipes") and
+mapped, together with max_recipes, to the ids of the recipes the last
+crawl stored. Fresh entries are answered straight from the recipes
+table. Stale entries are still answered immediately while a background
+crawl refreshes them. Concurrent identical searches share a single
+in-flight crawl (single-flight) instead of each hitting the sites.
+"""
+import json
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from db import get_database
+
+NON_WORD_RE = re.compile(r'[^\w\s]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Canonical cache key for a search query"""
+    query = NON_WORD_RE.sub(' ', (query or '').lower())
+    return WHITESPACE_RE.sub(' ', query).strip()
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn):
+        """Return (result, leader); leader is False when the result came from another caller's call"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result(), False
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, True
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class QueryCache:
+    def __init__(self, db_path='recipes.db', ttl=3600, stale_ttl=86400, refresh_workers=2):
+        self.db_path = db_path
+        self.ttl = ttl
+        # How long past ttl an entry may still be served while it is refreshed
+        self.stale_ttl = stale_ttl
+        self.flights = SingleFlight()
+        self.refresh_executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='query-refresh')
+
+    def lookup(self, query_key, max_recipes):
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT recipe_ids, sources, fetched_at FROM query_cache
+                WHERE query_key = ? AND max_recipes = ?
+            ''', (query_key, max_recipes))
+            row = cursor.fetchone()
+
+        if not row:
+            return None
+        return {
+            'recipe_ids': json.loads(row[0]),
+            'sources': json.loads(row[1]) if row[1] else {},
+            'age': time.time() - row[2]
+        }
+
+    def store(self, query_key, max_recipes, recipe_ids, sources):
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO query_cache (query_key, max_recipes, recipe_ids, sources, fetched_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (query_key, max_recipes) DO UPDATE SET
+                    recipe_ids = excluded.recipe_ids,
+                    sources = excluded.sources,
+                    fetched_at = excluded.fetched_at
+            ''', (query_key, max_recipes, json.dumps(recipe_ids), json.dumps(sources), time.time()))
+            conn.commit()
+
+    def _fetch_and_store(self, query_key, max_recipes, fetch):
+        recipes, sources = fetch()
+        # Only cache real crawl results, not the canned fallback recipes
+        if any(status.get('count') for status in sources.values()):
+            self.store(query_key, max_recipes, [recipe['id'] for recipe in recipes], sources)
+        return recipes, sources
+
+    def refresh_in_background(self, query_key, max_recipes, fetch):
+        flight_key = (query_key, max_recipes)
+        if self.flights.in_flight(flight_key):
+            return
+        self.refresh_executor.submit(self._refresh, flight_key, query_key, max_recipes, fetch)
+
+    def _refresh(self, flight_key, query_key, max_recipes, fetch):
+        try:
+            self.flights.do(flight_key, lambda: self._fetch_and_store(query_key, max_recipes, fetch))
+        except Exception as e:
+            print(f"Background refresh of '{query_key}' failed: {e}")
+
+    def get_or_fetch(self, query, max_recipes, fetch, refresh=False):
+        """Answer a search from the cache, or crawl it via fetch() -> (recipes, sources).
+
+        Returns a dict with 'cache' ('hit', 'stale', 'miss' or 'coalesced'),
+        'sources', and either 'recipes' (after a crawl) or just 'recipe_ids'
+        (from the cache) for the caller to load.
+        """
+        query_key = normalize_query(query)
+
+        if not refresh:
+            entry = self.lookup(query_key, max_recipes)
+            if entry and entry['age'] < self.ttl:
+                return {'cache': 'hit', 'recipe_ids': entry['recipe_ids'], 'recipes': None,
+                        'sources': entry['sources']}
+            if entry and entry['age'] < self.ttl + self.stale_ttl:
+                self.refresh_in_background(query_key, max_recipes, fetch)
+                return {'cache': 'stale', 'recipe_ids': entry['recipe_ids'], 'recipes': None,
+                        'sources': entry['sources']}
+
+        (recipes, sources), leader = self.flights.do(
+            (query_key, max_recipes),
+            lambda: self._fetch_and_store(query_key, max_recipes, fetch)
+        )
+        return {'cache': 'miss' if leader else 'coalesced', 'recipe_ids': [recipe['id'] for recipe in recipes],
+                'recipes': recipes, 'sources': sources}
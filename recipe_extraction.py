@@ -0,0 +1,806 @@
+"""Recipe page parsing and extraction.
+
+Most recipe sites embed a schema.org Recipe object in a
+<script type="application/ld+json"> block. Reading it directly is both
+faster and more accurate than running the CSS selector cascade over the
+whole document, so extract_recipe tries it first and only falls back to
+the selectors when it is missing.
+
+Parsing uses a configurable BeautifulSoup backend (lxml by default) and,
+in partial mode, only materialises the parts of the page we read: the
+<meta>/<script> tags for structured data and the main/article recipe
+containers for the selector cascade. The whole document is parsed only
+when those subsets do not yield a usable recipe.
+
+RecipeMarkupScanner lets a streaming download stop as soon as either of
+those has arrived, so the rest of a large page is never transferred.
+"""
+import html
+import json
+import os
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+from site_adapters import adapter_for_url
+
+# Only build the subtrees extraction reads from, falling back to a full parse
+PARTIAL_PARSE = os.getenv('HTML_PARTIAL_PARSE', '1') == '1'
+
+# <meta> and <script> tags carry JSON-LD and Open Graph images
+STRUCTURED_DATA_STRAINER = SoupStrainer(['title', 'meta', 'script'])
+
+# Recipe containers plus the headline and meta tags the selectors fall back on
+RECIPE_CONTENT_STRAINER = SoupStrainer(['main', 'article', 'h1', 'meta'])
+
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
+SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+([.,;:!?])')
+NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+# Byte patterns for spotting recipe markup in a partially downloaded page
+JSON_LD_OPEN_RE = re.compile(rb'<script[^>]*application/ld\+json[^>]*>', re.IGNORECASE)
+SCRIPT_CLOSE_RE = re.compile(rb'</script\s*>', re.IGNORECASE)
+MAIN_CLOSE_RE = re.compile(rb'</main\s*>', re.IGNORECASE)
+HEAD_CLOSE_RE = re.compile(rb'</head\s*>', re.IGNORECASE)
+RECIPE_TYPE_RE = re.compile(rb'"@type"\s*:\s*(?:\[[^\]]*)?"Recipe"')
+# Bytes re-examined from the previous chunk in case a tag straddles two chunks
+SCAN_OVERLAP = 64
+
+# schema.org NutritionInformation property -> our nutrition key
+NUTRITION_FIELDS = {
+    'calories': 'calories',
+    'proteinContent': 'protein',
+    'carbohydrateContent': 'carbs',
+    'fatContent': 'fat',
+    'fiberContent': 'fiber',
+    'sugarContent': 'sugar'
+}
+
+
+def resolve_parser(name):
+    """Return name if BeautifulSoup has that tree builder, else the built-in html.parser"""
+    try:
+        BeautifulSoup('', name)
+        return name
+    except FeatureNotFound:
+        print(f"HTML parser '{name}' is not installed, using html.parser")
+        return 'html.parser'
+
+
+# BeautifulSoup tree builder: 'lxml' (fast), 'html.parser' (pure Python) or 'html5lib'
+HTML_PARSER = resolve_parser(os.getenv('HTML_PARSER', 'lxml'))
+
+
+def make_soup(content, parse_only=None):
+    """Parse HTML with the configured backend, optionally keeping only strained tags"""
+    return BeautifulSoup(content, HTML_PARSER, parse_only=parse_only)
+
+
+def clean_text(value):
+    """Strip markup and collapse whitespace in a JSON-LD text value"""
+    if not isinstance(value, str):
+        return ''
+    text = html.unescape(TAG_RE.sub(' ', value))
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    return SPACE_BEFORE_PUNCT_RE.sub(r'\1', text)
+
+
+def iter_json_ld_objects(data):
+    """Yield every dict in a JSON-LD document, descending into lists and @graph"""
+    if isinstance(data, list):
+        for item in data:
+            yield from iter_json_ld_objects(item)
+    elif isinstance(data, dict):
+        yield data
+        if '@graph' in data:
+            yield from iter_json_ld_objects(data['@graph'])
+
+
+def is_recipe(obj):
+    types = obj.get('@type')
+    if isinstance(types, str):
+        types = [types]
+    return isinstance(types, list) and 'Recipe' in types
+
+
+def find_json_ld_recipe(soup):
+    """Return the first schema.org Recipe object embedded in the page, or None"""
+    for script in soup.find_all('script', type='application/ld+json'):
+        raw = script.string or script.get_text()
+        if not raw or 'Recipe' not in raw:
+            continue
+        try:
+            data = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        for obj in iter_json_ld_objects(data):
+            if is_recipe(obj):
+                return obj
+    return None
+
+
+def parse_instructions(value):
+    """Flatten recipeInstructions (text, HowToStep, HowToSection) into a list of steps"""
+    steps = []
+    if isinstance(value, str):
+        for line in re.split(r'\n+', value):
+            text = clean_text(line)
+            if text:
+                steps.append(text)
+    elif isinstance(value, list):
+        for item in value:
+            steps.extend(parse_instructions(item))
+    elif isinstance(value, dict):
+        if 'itemListElement' in value:
+            steps.extend(parse_instructions(value['itemListElement']))
+        else:
+            text = clean_text(value.get('text') or value.get('name'))
+            if text:
+                steps.append(text)
+    return steps
+
+
+def parse_image(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return value.get('url') or value.get('contentUrl')
+    if isinstance(value, list) and value:
+        return parse_image(value[0])
+    return None
+
+
+def parse_yield(value):
+    if isinstance(value, list):
+        # Sites often give both "4" and "4 servings"; prefer the descriptive one
+        values = [clean_text(str(v)) for v in value if v]
+        return max(values, key=len) if values else None
+    if value is None:
+        return None
+    return clean_text(str(value)) or None
+
+
+def parse_nutrition(value):
+    if not isinstance(value, dict):
+        return None
+    nutrition = {}
+    for field, key in NUTRITION_FIELDS.items():
+        match = NUMBER_RE.search(str(value.get(field, '')))
+        if match:
+            number = float(match.group())
+            nutrition[key] = int(number) if number.is_integer() else number
+    return nutrition or None
+
+
+def extract_recipe_from_json_ld(soup, url):
+    """Extract recipe fields from JSON-LD; returns None when the page has no usable Recipe"""
+    obj = find_json_ld_recipe(soup)
+    if not obj:
+        return None
+
+    ingredients = []
+    for item in obj.get('recipeIngredient') or obj.get('ingredients') or []:
+        text = clean_text(item)
+        if text and text not in ingredients:
+            ingredients.append(text)
+
+    instructions = []
+    for text in parse_instructions(obj.get('recipeInstructions')):
+        if text not in instructions:
+            instructions.append(text)
+
+    if len(ingredients) < 2 or len(instructions) < 1:
+        return None
+
+    image_url = parse_image(obj.get('image'))
+    if image_url:
+        image_url = urljoin(url, image_url)
+
+    return {
+        'title': clean_text(obj.get('name')) or None,
+        'ingredients': ingredients,
+        'instructions': instructions,
+        'image_url': image_url,
+        'recipe_yield': parse_yield(obj.get('recipeYield')),
+        'nutrition': parse_nutrition(obj.get('nutrition'))
+    }
+
+
+TITLE_SELECTORS = [
+    'h1',
+    'h1[class*="title"]',
+    'h1[class*="recipe"]',
+    'h1[class*="headline"]',
+    'h1[class*="main"]',
+    'h2[class*="title"]',
+    'h2[class*="recipe"]',
+    'h2[class*="headline"]',
+    'h3[class*="title"]',
+    'h3[class*="recipe"]',
+    '[class*="recipe-title"]',
+    '[class*="recipe-headline"]',
+    '[class*="main-title"]'
+]
+
+INGREDIENT_SELECTORS = [
+    '[class*="ingredient"]',
+    '[class*="ingredients"]',
+    'li[class*="ingredient"]',
+    'span[class*="ingredient"]',
+    'div[class*="ingredient"]',
+    '[class*="ingredients-list"] li',
+    '[class*="ingredient-list"] li',
+    '[class*="recipe-ingredients"] li',
+    # Class matching is case-sensitive; BEM-style markup capitalizes ("o-Ingredients__a-Ingredient")
+    'li[class*="ingredient" i]',
+    'p[class*="ingredient" i]'
+]
+
+INSTRUCTION_SELECTORS = [
+    '[class*="instruction"]',
+    '[class*="directions"]',
+    '[class*="steps"]',
+    '[class*="method"]',
+    'li[class*="step"]',
+    'p[class*="instruction"]',
+    '[class*="recipe-instructions"] li',
+    '[class*="recipe-directions"] li',
+    '[class*="cooking-steps"] li',
+    'li[class*="step" i]'
+]
+
+IMAGE_SELECTORS = [
+    # High priority - recipe-specific images
+    'img[class*="recipe"]',
+    'img[class*="food"]',
+    'img[class*="hero"]',
+    'img[class*="main"]',
+    'img[class*="featured"]',
+    'img[class*="primary"]',
+    'img[class*="lead"]',
+    '[class*="recipe-image"] img',
+    '[class*="hero-image"] img',
+    '[class*="main-image"] img',
+    '[class*="featured-image"] img',
+    '[class*="lead-image"] img',
+    # Medium priority - general content images
+    'img[class*="content"]',
+    'img[class*="article"]',
+    'img[class*="post"]',
+    '[class*="content-image"] img',
+    '[class*="article-image"] img',
+    # Low priority - any image with food-related attributes
+    'img[alt*="recipe"]',
+    'img[alt*="food"]',
+    'img[alt*="dish"]',
+    'img[alt*="cooking"]',
+    'img[alt*="meal"]'
+]
+
+
+def select_title(soup, selector):
+    title_elem = soup.select_one(selector)
+    return title_elem.get_text(strip=True) if title_elem else None
+
+
+def extract_title(soup, learned=None):
+    """Find the recipe title with the CSS selector cascade.
+
+    learned is the page's DomainSelectorStats: its winning selector is
+    tried on its own first and the full cascade only runs if it misses.
+    """
+    winner = learned.winner('title') if learned else None
+    if winner:
+        title = select_title(soup, winner)
+        ok = bool(title and len(title) > 3)
+        learned.shortcut('title', winner, ok)
+        if ok:
+            return title
+
+    title = None
+    for selector in TITLE_SELECTORS:
+        title = select_title(soup, selector) or title
+        if title and len(title) > 3:
+            if learned:
+                learned.record('title', selector)
+            break
+
+    return title
+
+
+def select_ingredients(soup, selector):
+    ingredients = []
+    for elem in soup.select(selector):
+        ingredient_text = elem.get_text(strip=True)
+        if ingredient_text and len(ingredient_text) > 3 and len(ingredient_text) < 200:
+            # Clean up the ingredient text
+            clean_text = re.sub(r'\s+', ' ', ingredient_text).strip()
+            if clean_text and clean_text not in ingredients:
+                ingredients.append(clean_text)
+    return ingredients
+
+
+def extract_ingredients(soup, learned=None):
+    """Find ingredient lines with the CSS selector cascade"""
+    winner = learned.winner('ingredients') if learned else None
+    if winner:
+        ingredients = select_ingredients(soup, winner)
+        learned.shortcut('ingredients', winner, bool(ingredients))
+        if ingredients:
+            return ingredients
+
+    ingredients = []
+    for selector in INGREDIENT_SELECTORS:
+        ingredients = select_ingredients(soup, selector)
+        if ingredients:
+            if learned:
+                learned.record('ingredients', selector)
+            break
+
+    # If no ingredients found, try a more generic approach
+    if not ingredients:
+        # Look for lists that might contain ingredients
+        lists = soup.find_all(['ul', 'ol'])
+        for lst in lists:
+            # Site menus are lists of links, not ingredients
+            if lst.find_parent(['nav', 'header', 'footer']):
+                continue
+            items = lst.find_all('li')
+            for item in items:
+                text = item.get_text(strip=True)
+                if text and len(text) > 5 and len(text) < 200:
+                    # Check if this looks like an ingredient
+                    text_lower = text.lower()
+                    if not any(word in text_lower for word in ['step', 'instruction', 'direction', 'preheat', 'heat', 'cook', 'bake', 'grill', 'fry', 'simmer', 'boil']):
+                        clean_text = re.sub(r'\s+', ' ', text).strip()
+                        if clean_text and clean_text not in ingredients:
+                            ingredients.append(clean_text)
+
+    return ingredients
+
+
+def select_instructions(soup, selector):
+    instructions = []
+    for elem in soup.select(selector):
+        instruction_text = elem.get_text(strip=True)
+        if instruction_text and len(instruction_text) > 10 and len(instruction_text) < 500:
+            clean_text = re.sub(r'\s+', ' ', instruction_text).strip()
+            if clean_text and clean_text not in instructions:
+                instructions.append(clean_text)
+    return instructions
+
+
+def extract_instructions(soup, learned=None):
+    """Find instruction steps with the CSS selector cascade.
+
+    Without a learned winner every selector runs and their steps are
+    merged; the selector that contributed the most steps is recorded as
+    the winner for the site.
+    """
+    winner = learned.winner('instructions') if learned else None
+    if winner:
+        instructions = select_instructions(soup, winner)
+        learned.shortcut('instructions', winner, bool(instructions))
+        if instructions:
+            return instructions
+
+    instructions = []
+    best_selector, best_count = None, 0
+    for selector in INSTRUCTION_SELECTORS:
+        added = [text for text in select_instructions(soup, selector) if text not in instructions]
+        instructions.extend(added)
+        if len(added) > best_count:
+            best_selector, best_count = selector, len(added)
+
+    if learned and best_selector:
+        learned.record('instructions', best_selector)
+    return instructions
+
+
+def score_image(img):
+    """Rank a candidate <img> by how likely it is to be the recipe's main image"""
+    score = 0
+
+    # Higher score for larger images (check width/height attributes)
+    width = img.get('width') or img.get('data-width')
+    height = img.get('height') or img.get('data-height')
+    if width and height:
+        try:
+            w, h = int(width), int(height)
+            if w >= 400 and h >= 300:  # Good size
+                score += 10
+            elif w >= 300 and h >= 200:  # Acceptable size
+                score += 5
+        except ValueError:
+            pass
+
+    # Higher score for images with descriptive alt text
+    alt = img.get('alt', '').lower()
+    if any(word in alt for word in ['recipe', 'food', 'dish', 'cooking', 'meal', 'delicious']):
+        score += 8
+
+    # Higher score for images with specific classes
+    img_class = img.get('class', [])
+    if any('recipe' in cls.lower() for cls in img_class):
+        score += 6
+    if any('hero' in cls.lower() or 'main' in cls.lower() for cls in img_class):
+        score += 4
+
+    # Higher score for images that are likely the main image
+    if img.find_parent(['header', 'article', 'main']):
+        score += 3
+
+    return score
+
+
+def best_image(soup, selectors):
+    """Return (img, selector) for the best scoring image the selectors match, or (None, None)"""
+    best_img, best_selector = None, None
+    best_score = 0
+    for selector in selectors:
+        for img in soup.select(selector):
+            if not img.get('src'):
+                continue
+            score = score_image(img)
+            # Check if this is a better image than what we have
+            if score > best_score:
+                best_score = score
+                best_img, best_selector = img, selector
+    return best_img, best_selector
+
+
+def extract_image(soup, url, learned=None):
+    """Find the best recipe image with selectors, meta tags and JSON-LD fallbacks"""
+    image_url = None
+
+    # Try to find the best quality image, starting with the site's usual selector
+    best_img = None
+    winner = learned.winner('image') if learned else None
+    if winner:
+        best_img, _ = best_image(soup, [winner])
+        learned.shortcut('image', winner, best_img is not None)
+    if best_img is None:
+        best_img, selector = best_image(soup, IMAGE_SELECTORS)
+        if learned and best_img is not None:
+            learned.record('image', selector)
+
+    # Use the best image found, or fall back to simpler selection
+    if best_img is not None:
+        image_url = best_img['src']
+    else:
+        # Fallback: try to find any reasonable image
+        images = soup.find_all('img')
+        for img in images:
+            src = img.get('src')
+            if src and len(src) > 10:  # Avoid very short URLs
+                # Skip common non-recipe images
+                skip_patterns = ['logo', 'icon', 'avatar', 'banner', 'ad', 'sponsor']
+                if not any(pattern in src.lower() for pattern in skip_patterns):
+                    image_url = src
+                    break
+
+    # Make image URL absolute if it's relative
+    if image_url:
+        if image_url.startswith('//'):
+            image_url = 'https:' + image_url
+        elif image_url.startswith('/'):
+            base_url = '/'.join(url.split('/')[:3])  # Get domain
+            image_url = base_url + image_url
+        elif not image_url.startswith('http'):
+            base_url = '/'.join(url.split('/')[:-1])  # Get directory
+            image_url = base_url + '/' + image_url
+
+        # Clean up the URL (remove query parameters that might cause issues)
+        if '?' in image_url:
+            base_img_url = image_url.split('?')[0]
+            # Keep the URL if it looks like a proper image
+            if any(ext in base_img_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp', '.gif']):
+                image_url = base_img_url
+
+    # Site-specific image extraction fallbacks
+    if not image_url:
+        adapter = adapter_for_url(url)
+        if adapter:
+            for selector in adapter.image_selectors:
+                img_elem = selector.select_one(soup)
+                if img_elem:
+                    src = next((img_elem.get(attr) for attr in adapter.image_attrs if img_elem.get(attr)), None)
+                    if src:
+                        image_url = src
+                        break
+
+        # Make the site-specific image URL absolute if needed
+        if image_url and not image_url.startswith('http'):
+            if image_url.startswith('//'):
+                image_url = 'https:' + image_url
+            elif image_url.startswith('/'):
+                base_url = '/'.join(url.split('/')[:3])
+                image_url = base_url + image_url
+            else:
+                base_url = '/'.join(url.split('/')[:-1])
+                image_url = base_url + '/' + image_url
+
+    # Additional fallback: Look for images in meta tags (Open Graph, Twitter Cards)
+    if not image_url:
+        meta_selectors = [
+            'meta[property="og:image"]',
+            'meta[name="twitter:image"]',
+            'meta[property="og:image:secure_url"]',
+            'meta[name="image"]'
+        ]
+        for selector in meta_selectors:
+            meta_elem = soup.select_one(selector)
+            if meta_elem:
+                content = meta_elem.get('content')
+                if content and content.startswith(('http://', 'https://')):
+                    image_url = content
+                    print(f"Found image in meta tag: {image_url}")
+                    break
+
+    # Additional fallback: Look for images in JSON-LD structured data
+    if not image_url:
+        json_ld_scripts = soup.find_all('script', type='application/ld+json')
+        for script in json_ld_scripts:
+            try:
+                json_data = json.loads(script.string)
+                if isinstance(json_data, dict):
+                    # Look for image in various JSON-LD structures
+                    if 'image' in json_data:
+                        if isinstance(json_data['image'], str):
+                            image_url = json_data['image']
+                            break
+                        elif isinstance(json_data['image'], dict) and 'url' in json_data['image']:
+                            image_url = json_data['image']['url']
+                            break
+                        elif isinstance(json_data['image'], list) and len(json_data['image']) > 0:
+                            if isinstance(json_data['image'][0], str):
+                                image_url = json_data['image'][0]
+                                break
+                            elif isinstance(json_data['image'][0], dict) and 'url' in json_data['image'][0]:
+                                image_url = json_data['image'][0]['url']
+                                break
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+
+    return image_url
+
+
+def extract_with_selectors(soup, url, learned=None):
+    """Run the CSS selector cascade for every field over soup"""
+    return {
+        'title': extract_title(soup, learned),
+        'ingredients': extract_ingredients(soup, learned),
+        'instructions': extract_instructions(soup, learned),
+        'image_url': extract_image(soup, url, learned),
+        'recipe_yield': None,
+        'nutrition': None
+    }
+
+
+def is_complete(recipe):
+    return bool(recipe['title']) and len(recipe['ingredients']) >= 2 and len(recipe['instructions']) >= 1
+
+
+class RecipeMarkupScanner:
+    """Streaming stop predicate: true once a page has sent what extraction reads.
+
+    That is a complete JSON-LD block describing a Recipe or, for pages
+    without structured data, the end of the <main> recipe container.
+    </main> only counts once the whole <head> has arrived without a Recipe
+    block in it and while no JSON-LD block is still open; otherwise the
+    download runs on to the end or the byte cap. Site-wide blocks such as
+    Organization or BreadcrumbList in the head do not hold it back. Each
+    call only scans the bytes added since the last one.
+    """
+
+    # Prefixes cut at the same point can be cached and reused by later reads
+    cache_tag = 'recipe_markup'
+
+    def __init__(self):
+        self.pos = 0
+        self.script_start = None
+        self.head_pos = 0
+        self.head_end = None
+        self.script_in_head = False
+        self.head_recipe = False
+
+    def __call__(self, body):
+        if self.head_end is None:
+            match = HEAD_CLOSE_RE.search(body, max(self.head_pos - SCAN_OVERLAP, 0))
+            if match:
+                self.head_end = match.start()
+            else:
+                self.head_pos = len(body)
+
+        while True:
+            if self.script_start is None:
+                match = JSON_LD_OPEN_RE.search(body, max(self.pos - SCAN_OVERLAP, 0))
+                if not match:
+                    break
+                self.script_in_head = self.head_end is None or match.start() < self.head_end
+                self.script_start = self.pos = match.end()
+            else:
+                match = SCRIPT_CLOSE_RE.search(body, max(self.pos - SCAN_OVERLAP, self.script_start))
+                if not match:
+                    break
+                if RECIPE_TYPE_RE.search(body, self.script_start, match.start()):
+                    if self._parses(body[self.script_start:match.start()]):
+                        return True
+                    self.head_recipe = self.head_recipe or self.script_in_head
+                self.script_start = None
+                self.pos = match.end()
+
+        main_may_end = self.head_end is not None and not self.head_recipe and self.script_start is None
+        found_main_end = main_may_end and MAIN_CLOSE_RE.search(body, max(self.pos - SCAN_OVERLAP, 0)) is not None
+        if self.script_start is None:
+            self.pos = len(body)
+        return found_main_end
+
+    @staticmethod
+    def _parses(block):
+        # A malformed block sends extraction to the selectors, which need the body
+        try:
+            json.loads(bytes(block))
+            return True
+        except ValueError:
+            return False
+
+
+def extract_recipe(content, url, json_ld_first=True, partial=None, selector_stats=None):
+    """Extract a recipe from raw page HTML.
+
+    Returns the recipe fields plus 'extraction_method' ('json_ld' or
+    'selectors'); the fields may be empty when the page has no recipe.
+    With a SelectorStats, the cascade tries each field's learned selector
+    for the page's site first and records which selectors won.
+    """
+    if partial is None:
+        partial = PARTIAL_PARSE
+    learned = selector_stats.for_url(url) if selector_stats else None
+    full_soup = None
+
+    def full():
+        nonlocal full_soup
+        if full_soup is None:
+            full_soup = make_soup(content)
+        return full_soup
+
+    if json_ld_first:
+        head = make_soup(content, parse_only=STRUCTURED_DATA_STRAINER) if partial else full()
+        structured = extract_recipe_from_json_ld(head, url)
+        if structured:
+            if not structured['title']:
+                structured['title'] = extract_title(full(), learned)
+            if not structured['image_url']:
+                # Meta tags first; only build the whole tree if they have nothing
+                structured['image_url'] = extract_image(head, url) or extract_image(full(), url, learned)
+            structured['extraction_method'] = 'json_ld'
+            return structured
+
+    recipe = None
+    if partial:
+        # Only count this pass's selector outcomes if its result is the one kept
+        attempt = learned.deferred() if learned else None
+        recipe = extract_with_selectors(make_soup(content, parse_only=RECIPE_CONTENT_STRAINER), url, attempt)
+        if not is_complete(recipe):
+            recipe = None
+        elif attempt:
+            attempt.commit()
+    if recipe is None:
+        recipe = extract_with_selectors(full(), url, learned)
+    recipe['extraction_method'] = 'selectors'
+    return recipe
+
+
+def validate_and_optimize_image_url(image_url):
+    """Validate image URL and potentially optimize it for better performance"""
+    if not image_url:
+        return None
+
+    try:
+        # Check if the URL is valid
+        if not image_url.startswith(('http://', 'https://')):
+            return None
+
+        # For some sites, we can optimize the image URL for better performance
+        domain = image_url.lower()
+
+        # AllRecipes image optimization
+        if 'allrecipes.com' in domain:
+            # AllRecipes often supports size parameters
+            if '?' not in image_url:
+                image_url += '?w=400&h=300&fit=crop'
+            elif 'w=' not in image_url:
+                image_url += '&w=400&h=300&fit=crop'
+
+        # Food Network image optimization
+        elif 'foodnetwork.com' in domain:
+            # Food Network often supports size parameters
+            if '?' not in image_url:
+                image_url += '?w=400&h=300&fit=crop'
+            elif 'w=' not in image_url:
+                image_url += '&w=400&h=300&fit=crop'
+
+        # Epicurious image optimization
+        elif 'epicurious.com' in domain:
+            # Epicurious often supports size parameters
+            if '?' not in image_url:
+                image_url += '?w=400&h=300&fit=crop'
+            elif 'w=' not in image_url:
+                image_url += '&w=400&h=300&fit=crop'
+
+        # Generic image optimization for common image services
+        elif any(service in domain for service in ['unsplash.com', 'pexels.com', 'pixabay.com']):
+            # These services often support size parameters
+            if '?' not in image_url:
+                image_url += '?w=400&h=300&fit=crop'
+            elif 'w=' not in image_url:
+                image_url += '&w=400&h=300&fit=crop'
+
+        return image_url
+
+    except Exception as e:
+        print(f"Error optimizing image URL {image_url}: {e}")
+        return image_url  # Return original URL if optimization fails
+
+
+def get_fallback_image_url(title, ingredients):
+    """Get a relevant fallback image based on recipe content"""
+    try:
+        # Convert to lowercase for easier matching
+        title_lower = title.lower()
+        ingredients_lower = [ing.lower() for ing in ingredients]
+        all_text = title_lower + ' ' + ' '.join(ingredients_lower)
+
+        # Define fallback images for different food categories
+        fallback_images = {
+            # Chicken dishes
+            'chicken': 'https://images.unsplash.com/photo-1604503468506-a8da13d82791?w=400&h=300&fit=crop',
+            # Pasta dishes
+            'pasta': 'https://images.unsplash.com/photo-1621996346565-e3dbc353d2e5?w=400&h=300&fit=crop',
+            # Asian/Stir fry
+            'asian': 'https://images.unsplash.com/photo-1603133872878-684f208fb84b?w=400&h=300&fit=crop',
+            'stir': 'https://images.unsplash.com/photo-1603133872878-684f208fb84b?w=400&h=300&fit=crop',
+            # Vegetarian
+            'vegetarian': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
+            'vegan': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
+            # Mexican
+            'taco': 'https://images.unsplash.com/photo-1565299585323-38d6b0865b47?w=400&h=300&fit=crop',
+            'mexican': 'https://images.unsplash.com/photo-1565299585323-38d6b0865b47?w=400&h=300&fit=crop',
+            # Seafood
+            'fish': 'https://images.unsplash.com/photo-1519708227418-c8fd9a32b7a2?w=400&h=300&fit=crop',
+            'salmon': 'https://images.unsplash.com/photo-1519708227418-c8fd9a32b7a2?w=400&h=300&fit=crop',
+            # Desserts
+            'cake': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
+            'cookie': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
+            'dessert': 'https://images.unsplash.com/photo-1578985545062-69928b1d9587?w=400&h=300&fit=crop',
+            # Breakfast
+            'breakfast': 'https://images.unsplash.com/photo-1493770348161-369560ae357d?w=400&h=300&fit=crop',
+            'pancake': 'https://images.unsplash.com/photo-1493770348161-369560ae357d?w=400&h=300&fit=crop',
+            # Salad
+            'salad': 'https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400&h=300&fit=crop',
+            # Soup
+            'soup': 'https://images.unsplash.com/photo-1547592166-23ac45744acd?w=400&h=300&fit=crop',
+            # Pizza
+            'pizza': 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop',
+            # Burger
+            'burger': 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400&h=300&fit=crop',
+            # Steak
+            'steak': 'https://images.unsplash.com/photo-1546833999-b9f581a1996d?w=400&h=300&fit=crop',
+            'beef': 'https://images.unsplash.com/photo-1546833999-b9f581a1996d?w=400&h=300&fit=crop'
+        }
+
+        # Try to match based on title and ingredients
+        for keyword, image_url in fallback_images.items():
+            if keyword in all_text:
+                return image_url
+
+        # Default fallback image for general recipes
+        return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop'
+
+    except Exception as e:
+        print(f"Error getting fallback image: {e}")
+        # Return a generic food image as ultimate fallback
+        return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=300&fit=crop'
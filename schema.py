@@ -0,0 +1,229 @@
+"""Schema and SQL shared by the app and the command line tools.
+
+The Flask app, the bulk ingest CLI and reset_db.py all write to the
+same recipes.db; keeping their statements here means a column added to
+one cannot be forgotten in another, and none of them has to import the
+Flask app to get at it. create_schema is both the migration the app runs
+on startup and what reset_db.py builds a fresh database with, so the two
+cannot drift apart.
+"""
+
+# One row per source_url: a repeat scrape refreshes the recipe instead of duplicating it
+RECIPE_UPSERT_SQL = '''
+    INSERT INTO recipes (title, ingredients, instructions, nutrition_info, image_url, source_url, recipe_yield)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (source_url) DO UPDATE SET
+        title = excluded.title,
+        ingredients = excluded.ingredients,
+        instructions = excluded.instructions,
+        nutrition_info = COALESCE(excluded.nutrition_info, recipes.nutrition_info),
+        image_url = excluded.image_url,
+        recipe_yield = COALESCE(excluded.recipe_yield, recipes.recipe_yield)
+'''
+
+RECIPES_FTS_SQL = [
+    # External content table: the index stores only tokens and reads the text back from recipes
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        title, ingredients, instructions,
+        content='recipes', content_rowid='id', tokenize='porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts (rowid, title, ingredients, instructions)
+        VALUES (new.id, new.title, new.ingredients, new.instructions);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts (recipes_fts, rowid, title, ingredients, instructions)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE OF title, ingredients, instructions ON recipes BEGIN
+        INSERT INTO recipes_fts (recipes_fts, rowid, title, ingredients, instructions)
+        VALUES ('delete', old.id, old.title, old.ingredients, old.instructions);
+        INSERT INTO recipes_fts (rowid, title, ingredients, instructions)
+        VALUES (new.id, new.title, new.ingredients, new.instructions);
+    END
+    '''
+]
+
+
+def create_schema(cursor):
+    """Create, or bring up to date, every table, index and trigger the app uses"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            ingredients TEXT NOT NULL,
+            instructions TEXT NOT NULL,
+            nutrition_info TEXT,
+            image_url TEXT,
+            source_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            recipe_yield TEXT
+        )
+    ''')
+
+    # Older databases predate the recipe_yield column
+    cursor.execute('PRAGMA table_info(recipes)')
+    if 'recipe_yield' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE recipes ADD COLUMN recipe_yield TEXT')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT NOT NULL,
+            quantity TEXT,
+            unit TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_recipes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_id INTEGER,
+            user_rating INTEGER,
+            notes TEXT,
+            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        )
+    ''')
+
+    # Maps a normalized search to the recipe ids its last crawl stored
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS query_cache (
+            query_key TEXT NOT NULL,
+            max_recipes INTEGER NOT NULL,
+            recipe_ids TEXT NOT NULL,
+            sources TEXT,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (query_key, max_recipes)
+        )
+    ''')
+
+    # Searches seen, ranked by decayed popularity for the pre-warm crawler
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            query_key TEXT NOT NULL,
+            max_recipes INTEGER NOT NULL,
+            query TEXT NOT NULL,
+            score REAL NOT NULL,
+            scored_at REAL NOT NULL,
+            search_count INTEGER NOT NULL DEFAULT 0,
+            last_searched_at REAL,
+            last_crawled_at REAL,
+            last_result_count INTEGER,
+            last_error TEXT,
+            PRIMARY KEY (query_key, max_recipes)
+        )
+    ''')
+
+    # Which CSS selector found each field on each site
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS selector_stats (
+            domain TEXT NOT NULL,
+            field TEXT NOT NULL,
+            selector TEXT NOT NULL,
+            hits REAL NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (domain, field, selector)
+        )
+    ''')
+
+    # Background scrape jobs and their progress events, readable from any worker process
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            id TEXT PRIMARY KEY,
+            query TEXT NOT NULL,
+            max_recipes INTEGER NOT NULL,
+            options TEXT,
+            status TEXT NOT NULL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            updated_at REAL
+        )
+    ''')
+    # The running process's heartbeat; older tables predate it
+    cursor.execute('PRAGMA table_info(scrape_jobs)')
+    if 'updated_at' not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE scrape_jobs ADD COLUMN updated_at REAL')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_job_events (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            data TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (job_id, seq),
+            FOREIGN KEY (job_id) REFERENCES scrape_jobs (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scrape_jobs_finished_at ON scrape_jobs (finished_at)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS scrape_job_events_delete AFTER DELETE ON scrape_jobs BEGIN
+            DELETE FROM scrape_job_events WHERE job_id = old.id;
+        END
+    ''')
+
+    # One row per source URL so repeat scrapes update instead of duplicating
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_recipes_source_url'")
+    if not cursor.fetchone():
+        dedupe_recipes_by_source_url(cursor)
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_source_url ON recipes (source_url)')
+
+    # Newest-first listing and its keyset pagination read recipes in this order
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipes_created_at_id ON recipes (created_at DESC, id DESC)')
+
+    # Full-text index for /api/recipes/search; index the recipes stored before it existed
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'")
+    fts_exists = cursor.fetchone()
+    for statement in RECIPES_FTS_SQL:
+        cursor.execute(statement)
+    if not fts_exists:
+        cursor.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+
+    # One row per ingredient line, parsed, so ingredients can be looked up by name
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            raw_text TEXT NOT NULL,
+            name TEXT,
+            quantity REAL,
+            unit TEXT,
+            PRIMARY KEY (recipe_id, position),
+            FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_name ON recipe_ingredients (name, recipe_id)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS recipe_ingredients_delete AFTER DELETE ON recipes BEGIN
+            DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+        END
+    ''')
+
+
+def dedupe_recipes_by_source_url(cursor):
+    """Collapse duplicate recipes onto the oldest row for each source_url"""
+    cursor.execute('''
+        SELECT source_url, MIN(id) FROM recipes
+        WHERE source_url IS NOT NULL
+        GROUP BY source_url HAVING COUNT(*) > 1
+    ''')
+    removed = 0
+    for source_url, keep_id in cursor.fetchall():
+        cursor.execute('''
+            UPDATE saved_recipes SET recipe_id = ?
+            WHERE recipe_id IN (SELECT id FROM recipes WHERE source_url = ? AND id != ?)
+        ''', (keep_id, source_url, keep_id))
+        cursor.execute('DELETE FROM recipes WHERE source_url = ? AND id != ?', (source_url, keep_id))
+        removed += cursor.rowcount
+    if removed:
+        print(f"Removed {removed} duplicate recipes before adding unique source_url index")
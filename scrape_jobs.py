@@ -0,0 +1,350 @@
+"""Background scrape jobs with progress events.
+
+A multi-source crawl can take tens of seconds, which is far too long to
+hold a web worker. JobManager runs scrapes on its own thread pool and
+returns a job id straight away. Each job keeps an ordered log of
+progress events ('started', 'source', 'recipe', 'finished', 'failed')
+that clients can poll or follow as a server-sent-events stream.
+
+Job status and events are written through to the scrape_jobs and
+scrape_job_events tables as they happen, so with several worker
+processes (gunicorn -w N) any worker can answer a poll or follow the
+event stream of a job another worker is running. The process running a
+job wakes its own followers directly; other processes poll the tables.
+
+The running process also touches updated_at on its unfinished jobs every
+few seconds. A job whose heartbeat stops (its worker was killed) is
+marked failed by the next process that reads or prunes it, so followers
+stop waiting and the row is eventually pruned.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_database
+
+FINISHED_STATES = ('done', 'failed')
+
+
+class JobStore:
+    """scrape_jobs and scrape_job_events rows, shared by every worker process"""
+
+    def __init__(self, db_path='recipes.db', stale_seconds=60):
+        self.db_path = db_path
+        # An unfinished job without a heartbeat for this long belongs to a dead process
+        self.stale_seconds = stale_seconds
+
+    def create(self, job):
+        with get_database(self.db_path).connection() as conn:
+            conn.execute('''
+                INSERT INTO scrape_jobs (id, query, max_recipes, options, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (job.id, job.query, job.max_recipes, json.dumps(job.options, default=str),
+                  job.status, job.created_at, job.created_at))
+            conn.commit()
+
+    def save_event(self, job, event):
+        """Write an event together with the job's current status, in one transaction"""
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.execute('''
+                UPDATE scrape_jobs SET status = ?, error = ?, started_at = ?, finished_at = ?, updated_at = ?
+                WHERE id = ? AND status NOT IN (?, ?)
+            ''', (job.status, job.error, job.started_at, job.finished_at, event['time'], job.id) + FINISHED_STATES)
+            if cursor.rowcount == 0:
+                # Already failed as stale by another process; its final event is written
+                return
+            conn.execute('''
+                INSERT INTO scrape_job_events (job_id, seq, type, data, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (job.id, event['seq'], event['type'], json.dumps(event['data'], default=str), event['time']))
+            conn.commit()
+
+    def load(self, job_id):
+        """The job as last written by whichever process runs it, or None"""
+        with get_database(self.db_path).connection() as conn:
+            row = conn.execute('SELECT query, max_recipes, options FROM scrape_jobs WHERE id = ?',
+                               (job_id,)).fetchone()
+        if not row:
+            return None
+        job = ScrapeJob(row[0], row[1], json.loads(row[2] or '{}'), job_id=job_id, store=self, local=False)
+        self.refresh(job)
+        return job
+
+    def refresh(self, job):
+        """Pull a job's status and the events it does not have yet"""
+        with get_database(self.db_path).connection() as conn:
+            # One read transaction, so a finished status always comes with its final event
+            conn.execute('BEGIN')
+            row = conn.execute('''
+                SELECT status, error, created_at, started_at, finished_at, updated_at FROM scrape_jobs WHERE id = ?
+            ''', (job.id,)).fetchone()
+            rows = conn.execute('''
+                SELECT seq, type, data, created_at FROM scrape_job_events
+                WHERE job_id = ? AND seq > ? ORDER BY seq
+            ''', (job.id, len(job.events))).fetchall()
+        if row and row[0] not in FINISHED_STATES and (row[5] or row[2]) < time.time() - self.stale_seconds:
+            if self.fail_stale(job.id):
+                return self.refresh(job)
+        with job._condition:
+            if row:
+                job.status, job.error, job.created_at, job.started_at, job.finished_at = row[:5]
+            for seq, event_type, data, created_at in rows:
+                if seq == len(job.events) + 1:
+                    job._apply({'seq': seq, 'type': event_type, 'data': json.loads(data), 'time': created_at})
+
+    def heartbeat(self, job_ids):
+        """Record that this process is still running the given jobs"""
+        with get_database(self.db_path).connection() as conn:
+            now = time.time()
+            conn.executemany('UPDATE scrape_jobs SET updated_at = ? WHERE id = ?',
+                             [(now, job_id) for job_id in job_ids])
+            conn.commit()
+
+    def fail_stale(self, job_id=None):
+        """Fail unfinished jobs, or just job_id, whose heartbeat stopped; returns how many"""
+        now = time.time()
+        error = 'Scrape job abandoned: the worker running it stopped'
+        with get_database(self.db_path).connection() as conn:
+            # Write lock up front, so the job's final event gets the next free seq
+            conn.execute('BEGIN IMMEDIATE')
+            stale = [row[0] for row in conn.execute('''
+                SELECT id FROM scrape_jobs
+                WHERE status NOT IN (?, ?) AND COALESCE(updated_at, created_at) < ? AND (? IS NULL OR id = ?)
+            ''', FINISHED_STATES + (now - self.stale_seconds, job_id, job_id)).fetchall()]
+            for stale_id in stale:
+                conn.execute('''
+                    UPDATE scrape_jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (error, now, now, stale_id))
+                conn.execute('''
+                    INSERT INTO scrape_job_events (job_id, seq, type, data, created_at)
+                    SELECT ?, COALESCE(MAX(seq), 0) + 1, 'failed', ?, ? FROM scrape_job_events WHERE job_id = ?
+                ''', (stale_id, json.dumps({'error': error}), now, stale_id))
+            conn.commit()
+        if stale:
+            print(f"Marked {len(stale)} abandoned scrape jobs as failed")
+        return len(stale)
+
+    def prune(self, finished_before):
+        """Delete the jobs, and their events, that finished before the given time
+
+        Abandoned jobs are failed first, so they are deleted once they age out too.
+        """
+        self.fail_stale()
+        with get_database(self.db_path).connection() as conn:
+            conn.execute('DELETE FROM scrape_jobs WHERE finished_at < ?', (finished_before,))
+            conn.commit()
+
+
+class ScrapeJob:
+    def __init__(self, query, max_recipes, options, job_id=None, store=None, local=True):
+        self.id = job_id or uuid.uuid4().hex
+        self.query = query
+        self.max_recipes = max_recipes
+        self.options = options
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.recipes = []
+        self.sources = {}
+        self.events = []
+        self.store = store
+        # False for a job loaded from the store that another process is running
+        self.local = local
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def _apply(self, event):
+        if event['type'] == 'recipe':
+            self.recipes.append(event['data'])
+        elif event['type'] == 'source':
+            self.sources[event['data']['source']] = event['data']
+        self.events.append(event)
+
+    def add_event(self, event_type, data=None):
+        with self._condition:
+            event = {
+                'seq': len(self.events) + 1,
+                'type': event_type,
+                'data': data,
+                'time': time.time()
+            }
+            if self.store:
+                self.store.save_event(self, event)
+            self._apply(event)
+            self._condition.notify_all()
+
+    def set_status(self, status, event_type=None, data=None):
+        # Same (reentrant) lock as add_event, so readers never see a finished
+        # job without its final event
+        with self._condition:
+            self.status = status
+            if status == 'running':
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+            self.add_event(event_type or status, data)
+
+    def events_after(self, seq, timeout=None, poll_seconds=0.5):
+        """Return events with seq greater than the given one, waiting up to timeout for new ones"""
+        if not self.local:
+            # Run by another process, which cannot notify us: poll the store instead
+            deadline = time.monotonic() + (timeout or 0)
+            while True:
+                self.store.refresh(self)
+                with self._condition:
+                    remaining = deadline - time.monotonic()
+                    if len(self.events) > seq or self.finished or remaining <= 0:
+                        return self.events[seq:]
+                time.sleep(min(poll_seconds, remaining))
+        with self._condition:
+            if len(self.events) <= seq and not self.finished and timeout:
+                self._condition.wait(timeout)
+            return self.events[seq:]
+
+    def to_dict(self, include_recipes=True):
+        with self._condition:
+            job = {
+                'job_id': self.id,
+                'query': self.query,
+                'max_recipes': self.max_recipes,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error,
+                'progress': {
+                    'sources_done': len(self.sources),
+                    'recipes_found': len(self.recipes),
+                    'events': len(self.events)
+                },
+                'sources': dict(self.sources)
+            }
+            if include_recipes:
+                job['recipes'] = list(self.recipes)
+            return job
+
+
+class JobManager:
+    def __init__(self, runner, db_path='recipes.db', max_workers=4, retention_seconds=3600, max_jobs=1000,
+                 heartbeat_seconds=10, stale_seconds=60):
+        # runner(query, max_recipes, on_event=..., **options) -> (recipes, sources)
+        self.runner = runner
+        self.store = JobStore(db_path, stale_seconds)
+        self.retention_seconds = retention_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        # Jobs this process runs stay in memory too, so their followers are woken without polling
+        self.max_jobs = max_jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._heartbeat = threading.Thread(target=self._beat, name='scrape-job-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def submit(self, query, max_recipes, **options):
+        job = ScrapeJob(query, max_recipes, options, store=self.store)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self.store.create(job)
+        job.add_event('queued', {'query': query, 'max_recipes': max_recipes})
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """The job, whether this process or another worker runs it; None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self.store.load(job_id)
+        return job
+
+    def _run(self, job):
+        job.set_status('running', 'started')
+        try:
+            self.runner(job.query, job.max_recipes, on_event=job.add_event, **job.options)
+            job.set_status('done', 'finished', {'total_found': len(job.recipes)})
+        except Exception as e:
+            print(f"Scrape job {job.id} failed: {e}")
+            job.error = str(e)
+            job.set_status('failed', 'failed', {'error': str(e)})
+
+    def _beat(self):
+        """Keep the heartbeat of this process's unfinished jobs fresh, even between their events"""
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self._lock:
+                job_ids = [job.id for job in self._jobs.values() if not job.finished]
+            if not job_ids:
+                continue
+            try:
+                self.store.heartbeat(job_ids)
+            except sqlite3.Error as e:
+                print(f"Error saving scrape job heartbeat: {e}")
+
+    def _prune(self):
+        """Forget finished jobs past the retention window, and the oldest ones beyond max_jobs"""
+        now = time.time()
+        self.store.prune(now - self.retention_seconds)
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.retention_seconds:
+                del self._jobs[job_id]
+        if len(self._jobs) >= self.max_jobs:
+            finished = sorted((job for job in self._jobs.values() if job.finished),
+                              key=lambda job: job.finished_at)
+            for job in finished[:len(self._jobs) - self.max_jobs + 1]:
+                del self._jobs[job.id]
+
+
+def format_sse(event):
+    """Render a job event as a server-sent-events message"""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+def stream_job_events(job, last_seq=0, keepalive_seconds=15):
+    """Yield SSE messages for a job until it finishes, starting after last_seq"""
+    seq = last_seq
+    while True:
+        events = job.events_after(seq, timeout=keepalive_seconds)
+        for event in events:
+            seq = event['seq']
+            yield format_sse(event)
+        if job.finished and seq >= len(job.events):
+            return
+        if not events:
+            # Comment line keeps proxies from closing an idle connection
+            yield ': keep-alive\n\n'
+
+
+def job_event_record(job, event):
+    """Flatten a job event into the record streamed as one NDJSON line, or None to skip it"""
+    if event['type'] == 'recipe':
+        return {'type': 'recipe', 'recipe': event['data']}
+    if event['type'] == 'source':
+        return dict(event['data'], type='source')
+    if event['type'] == 'finished':
+        return {'type': 'done', 'total_found': event['data']['total_found'], 'sources': dict(job.sources)}
+    if event['type'] == 'failed':
+        return {'type': 'error', 'error': event['data']['error']}
+    return None
+
+
+def stream_job_ndjson(job, poll_seconds=15):
+    """Yield newline-delimited JSON records for a job until it finishes"""
+    seq = 0
+    while True:
+        for event in job.events_after(seq, timeout=poll_seconds):
+            seq = event['seq']
+            record = job_event_record(job, event)
+            if record is not None:
+                yield json.dumps(record, default=str) + '\n'
+        if job.finished and seq >= len(job.events):
+            return
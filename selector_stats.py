@@ -0,0 +1,187 @@
+"""Per-site selector hit statistics for the CSS selector cascade.
+
+The selector cascade in recipe_extraction tries a fixed list of
+selectors per field, each a full-document search. A given site almost
+always answers to the same one, so SelectorStats remembers which
+selector produced each field on each domain and lets the cascade try
+that selector alone first. When it stops working (a site redesign) its
+score is halved and the full cascade runs and learns the new winner.
+
+Counts live in memory and are written to the selector_stats table in
+batches, so what was learned survives restarts. A flush adds this
+process's changes since the last flush to the stored counts rather than
+overwriting them, so several worker processes all contribute.
+"""
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from db import get_database
+
+
+def site_domain(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class SelectorStats:
+    def __init__(self, db_path=None, min_hits=3, flush_every=50, flush_interval=60):
+        # With db_path=None stats are kept in memory only
+        self.db_path = db_path
+        # A selector must have won this often before the cascade is skipped
+        self.min_hits = min_hits
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._hits = {}  # (domain, field) -> {selector: score}
+        self._deltas = {}  # (domain, field, selector) -> change in score since the last flush
+        self._last_flush = time.monotonic()
+        self.shortcuts = {'hit': 0, 'miss': 0}
+
+    def load(self):
+        if not self.db_path:
+            return
+        with get_database(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT domain, field, selector, hits FROM selector_stats')
+            rows = cursor.fetchall()
+        with self._lock:
+            for domain, field, selector, hits in rows:
+                self._hits.setdefault((domain, field), {})[selector] = hits
+
+    def winner(self, domain, field):
+        """The selector to try on its own first, or None while there is too little evidence"""
+        with self._lock:
+            scores = self._hits.get((domain, field))
+            if not scores:
+                return None
+            selector, hits = max(scores.items(), key=lambda item: item[1])
+            return selector if hits >= self.min_hits else None
+
+    def record(self, domain, field, selector):
+        """Count a win for selector, called when the full cascade found a field with it"""
+        with self._lock:
+            self._add_locked(domain, field, selector, 1)
+        self._maybe_flush()
+
+    def shortcut(self, domain, field, selector, ok):
+        """Account for an attempt to short-circuit to the learned winner"""
+        with self._lock:
+            if ok:
+                self.shortcuts['hit'] += 1
+                self._add_locked(domain, field, selector, 1)
+            else:
+                self.shortcuts['miss'] += 1
+                self._add_locked(domain, field, selector, -self._hits.get((domain, field), {}).get(selector, 0) / 2)
+        self._maybe_flush()
+
+    def _add_locked(self, domain, field, selector, delta):
+        scores = self._hits.setdefault((domain, field), {})
+        scores[selector] = scores.get(selector, 0) + delta
+        key = (domain, field, selector)
+        self._deltas[key] = self._deltas.get(key, 0) + delta
+
+    def for_url(self, url):
+        return DomainSelectorStats(self, site_domain(url))
+
+    def _maybe_flush(self):
+        if not self.db_path:
+            return
+        with self._lock:
+            due = (len(self._deltas) >= self.flush_every or
+                   (self._deltas and time.monotonic() - self._last_flush >= self.flush_interval))
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add the changes since the last flush to the selector_stats table"""
+        if not self.db_path:
+            return
+        with self._lock:
+            deltas = self._deltas
+            self._deltas = {}
+            self._last_flush = time.monotonic()
+        if not deltas:
+            return
+        try:
+            with get_database(self.db_path).connection() as conn:
+                # Other worker processes flush into the same rows, so add to their counts
+                conn.executemany('''
+                    INSERT INTO selector_stats (domain, field, selector, hits, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT (domain, field, selector) DO UPDATE SET
+                        hits = MAX(selector_stats.hits + excluded.hits, 0),
+                        updated_at = excluded.updated_at
+                ''', [key + (delta,) for key, delta in deltas.items()])
+                conn.commit()
+                stored = {key: conn.execute(
+                    'SELECT hits FROM selector_stats WHERE domain = ? AND field = ? AND selector = ?', key
+                ).fetchone()[0] for key in deltas}
+        except sqlite3.Error as e:
+            print(f"Error saving selector stats: {e}")
+            with self._lock:
+                for key, delta in deltas.items():
+                    self._deltas[key] = self._deltas.get(key, 0) + delta
+            return
+        # Pick up what the other processes counted, on top of anything recorded during the flush
+        with self._lock:
+            for (domain, field, selector), hits in stored.items():
+                pending = self._deltas.get((domain, field, selector), 0)
+                self._hits.setdefault((domain, field), {})[selector] = hits + pending
+
+    def stats(self):
+        with self._lock:
+            winners = {}
+            for (domain, field), scores in self._hits.items():
+                selector, hits = max(scores.items(), key=lambda item: item[1])
+                winners.setdefault(domain, {})[field] = {'selector': selector, 'hits': hits}
+            return {'shortcuts': dict(self.shortcuts), 'winners': winners}
+
+
+class DomainSelectorStats:
+    """SelectorStats bound to the domain of the page being extracted"""
+
+    def __init__(self, stats, domain):
+        self.stats = stats
+        self.domain = domain
+
+    def winner(self, field):
+        return self.stats.winner(self.domain, field)
+
+    def record(self, field, selector):
+        self.stats.record(self.domain, field, selector)
+
+    def shortcut(self, field, selector, ok):
+        self.stats.shortcut(self.domain, field, selector, ok)
+
+    def deferred(self):
+        """A recorder for a tentative extraction pass, see DeferredSelectorStats"""
+        return DeferredSelectorStats(self)
+
+
+class DeferredSelectorStats:
+    """Holds back the wins and shortcut outcomes of one extraction pass.
+
+    The partial-parse pass may be thrown away for a full-page pass over the
+    same page; only the pass whose result is kept should count, so its
+    outcomes are applied by commit() once that is known.
+    """
+
+    def __init__(self, learned):
+        self.learned = learned
+        self._outcomes = []
+
+    def winner(self, field):
+        return self.learned.winner(field)
+
+    def record(self, field, selector):
+        self._outcomes.append((self.learned.record, (field, selector)))
+
+    def shortcut(self, field, selector, ok):
+        self._outcomes.append((self.learned.shortcut, (field, selector, ok)))
+
+    def commit(self):
+        for apply, args in self._outcomes:
+            apply(*args)
+        self._outcomes = []
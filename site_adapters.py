@@ -0,0 +1,155 @@
+"""Declarative registry of recipe sites.
+
+Each SiteAdapter describes one source as data: how to build its search
+URL, which selectors find recipe cards on the results page, which links
+are real recipe pages, and where the site hides its lead image. CSS
+selectors and regexes are compiled once at import, and a single generic
+engine (app.scrape_site) drives every adapter, so adding a source is a
+matter of registering another adapter.
+"""
+import re
+from urllib.parse import quote_plus, urlparse
+
+import soupsieve
+
+# Shared by every adapter when pulling a title out of a card
+CARD_HEADING_TAGS = ['h3', 'h2', 'h1']
+CARD_TITLE_CLASS_RE = re.compile(r'title|headline|name')
+
+# Generic card selectors tried after the site's own ones
+GENERIC_CARD_SELECTORS = [
+    'div[class*="recipe-card"]',
+    'div[class*="search-result"]',
+    'article[class*="recipe"]',
+    'div[class*="recipe-item"]',
+    'div[class*="card"]'
+]
+
+
+class SiteAdapter:
+    def __init__(self, key, name, domain, search_url, recipe_path, card_selectors,
+                 image_selectors=(), image_attrs=('data-src', 'src'), query_separator='+', share=3):
+        self.key = key
+        self.name = name
+        self.domain = domain
+        self.bare_domain = domain[4:] if domain.startswith('www.') else domain
+        self.base_url = f"https://{domain}"
+        # search_url contains a {query} placeholder
+        self.search_url = search_url
+        self.query_separator = query_separator
+        self.recipe_path = recipe_path
+        self.recipe_link_re = re.compile(re.escape(recipe_path))
+        self.card_selectors = [(selector, soupsieve.compile(selector))
+                               for selector in list(card_selectors) + GENERIC_CARD_SELECTORS]
+        self.image_selectors = [soupsieve.compile(selector) for selector in image_selectors]
+        self.image_attrs = tuple(image_attrs)
+        # This site gets max_recipes // share of each search
+        self.share = share
+
+    def search_url_for(self, query):
+        terms = self.query_separator.join(quote_plus(word) for word in query.split())
+        return self.search_url.format(query=terms)
+
+    def absolute_url(self, href):
+        if href.startswith('http'):
+            return href
+        if href.startswith('/'):
+            return self.base_url + href
+        return self.base_url + '/' + href
+
+    def is_recipe_url(self, url):
+        return bool(url) and self.recipe_path in url
+
+    def matches(self, url):
+        host = urlparse(url).netloc.lower()
+        return host == self.bare_domain or host.endswith('.' + self.bare_domain)
+
+
+SITE_ADAPTERS = []
+_adapters_by_key = {}
+
+
+def register_adapter(adapter):
+    """Add a site to the registry; later registrations replace earlier ones with the same key"""
+    if adapter.key in _adapters_by_key:
+        SITE_ADAPTERS.remove(_adapters_by_key[adapter.key])
+    SITE_ADAPTERS.append(adapter)
+    _adapters_by_key[adapter.key] = adapter
+    return adapter
+
+
+def get_adapter(key):
+    return _adapters_by_key.get(key)
+
+
+def adapter_for_url(url):
+    """Return the adapter whose domain serves url, or None"""
+    for adapter in SITE_ADAPTERS:
+        if adapter.matches(url):
+            return adapter
+    return None
+
+
+register_adapter(SiteAdapter(
+    key='allrecipes',
+    name='AllRecipes',
+    domain='www.allrecipes.com',
+    search_url='https://www.allrecipes.com/search?q={query}',
+    query_separator='+',
+    recipe_path='/recipe/',
+    card_selectors=[
+        'a[href*="/recipe/"]',  # Direct recipe links
+        'div[class*="card__detailsContainer"]'
+    ],
+    image_selectors=[
+        'img[data-src*="recipe"]',
+        'img[data-src*="food"]',
+        'img[data-lazy-src]',
+        '[class*="lead-media"] img',
+        '[class*="recipe-media"] img'
+    ],
+    image_attrs=('data-src', 'data-lazy-src', 'src'),
+    share=2
+))
+
+register_adapter(SiteAdapter(
+    key='foodnetwork',
+    name='Food Network',
+    domain='www.foodnetwork.com',
+    search_url='https://www.foodnetwork.com/search/{query}-',
+    query_separator='-',
+    recipe_path='/recipes/',
+    card_selectors=[
+        'a[href*="/recipes/"]',  # Direct recipe links
+        'div[class*="o-ResultCard"]'
+    ],
+    image_selectors=[
+        'img[data-src*="recipe"]',
+        'img[data-src*="food"]',
+        '[class*="lead-media"] img',
+        '[class*="recipe-media"] img',
+        '[class*="hero-media"] img'
+    ],
+    share=3
+))
+
+register_adapter(SiteAdapter(
+    key='epicurious',
+    name='Epicurious',
+    domain='www.epicurious.com',
+    search_url='https://www.epicurious.com/search/{query}-',
+    query_separator='-',
+    recipe_path='/recipes/',
+    card_selectors=[
+        'a[href*="/recipes/"]',  # Direct recipe links
+        'div[class*="o-ResultCard"]'
+    ],
+    image_selectors=[
+        'img[data-src*="recipe"]',
+        'img[data-src*="food"]',
+        '[class*="lead-media"] img',
+        '[class*="recipe-media"] img',
+        '[class*="hero-media"] img'
+    ],
+    share=3
+))
@@ -1,10 +1,15 @@
-import React, { createContext, useContext, useReducer, useEffect } from 'react';
+import React, { createContext, useContext, useReducer, useEffect, useRef, useCallback } from 'react';
 import axios from 'axios';
 
 const RecipeContext = createContext();
 
+// Load the next page of stored recipes once the swiper is this close to the end
+const PREFETCH_REMAINING = 5;
+
 const initialState = {
   recipes: [],
+  // Cursor for the next page of /api/recipes; null once everything is loaded
+  nextCursor: null,
   currentRecipeIndex: 0,
   userIngredients: [],
   savedRecipes: [],
@@ -23,7 +28,21 @@ const recipeReducer = (state, action) => {
       return { ...state, error: action.payload, loading: false };
     
     case 'SET_RECIPES':
-      return { ...state, recipes: action.payload, currentRecipeIndex: 0, loading: false };
+      return { ...state, recipes: action.payload, nextCursor: null, currentRecipeIndex: 0, loading: false };
+    
+    case 'SET_NEXT_CURSOR':
+      return { ...state, nextCursor: action.payload };
+    
+    case 'APPEND_RECIPES':
+      // Ignore a page that arrives after the list was replaced (e.g. by a search)
+      if (action.payload.cursor !== state.nextCursor) {
+        return state;
+      }
+      return {
+        ...state,
+        recipes: [...state.recipes, ...action.payload.recipes],
+        nextCursor: action.payload.nextCursor
+      };
     
     case 'NEXT_RECIPE':
       return { 
@@ -83,6 +102,8 @@ const recipeReducer = (state, action) => {
 
 export const RecipeProvider = ({ children }) => {
   const [state, dispatch] = useReducer(recipeReducer, initialState);
+  // Cursor of the page being fetched, so each page is only requested once
+  const loadingCursor = useRef(null);
 
   // API functions
   const scrapeRecipes = async (query, maxRecipes = 10) => {
@@ -119,6 +140,7 @@ export const RecipeProvider = ({ children }) => {
       
       if (response.data.success) {
         dispatch({ type: 'SET_RECIPES', payload: response.data.recipes });
+        dispatch({ type: 'SET_NEXT_CURSOR', payload: response.data.next_cursor });
       } else {
         dispatch({ type: 'SET_ERROR', payload: response.data.error });
       }
@@ -127,6 +149,32 @@ export const RecipeProvider = ({ children }) => {
     }
   };
 
+  // /api/recipes returns one page at a time; follow next_cursor for the rest
+  const loadMoreRecipes = useCallback(async () => {
+    const cursor = state.nextCursor;
+    if (!cursor || loadingCursor.current === cursor) {
+      return;
+    }
+    
+    loadingCursor.current = cursor;
+    try {
+      const response = await axios.get('/api/recipes', { params: { cursor } });
+      
+      if (response.data.success) {
+        dispatch({
+          type: 'APPEND_RECIPES',
+          payload: { cursor, recipes: response.data.recipes, nextCursor: response.data.next_cursor }
+        });
+      }
+    } catch (error) {
+      console.error('Error loading more recipes:', error);
+    } finally {
+      if (loadingCursor.current === cursor) {
+        loadingCursor.current = null;
+      }
+    }
+  }, [state.nextCursor]);
+
   const getUserIngredients = async () => {
     try {
       const response = await axios.get('/api/ingredients');
@@ -219,10 +267,18 @@ export const RecipeProvider = ({ children }) => {
     getUserIngredients();
   }, []);
 
+  // Fetch the next page before the swiper runs out of recipes
+  useEffect(() => {
+    if (state.nextCursor && state.currentRecipeIndex >= state.recipes.length - PREFETCH_REMAINING) {
+      loadMoreRecipes();
+    }
+  }, [loadMoreRecipes, state.nextCursor, state.currentRecipeIndex, state.recipes.length]);
+
   const value = {
     ...state,
     scrapeRecipes,
     getRecipes,
+    loadMoreRecipes,
     getUserIngredients,
     addUserIngredient,
     removeUserIngredient,